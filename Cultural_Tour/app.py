@@ -1,15 +1,180 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, abort
+from flask import (Flask, Blueprint, render_template, request, redirect, url_for, flash, session, abort,
+                   make_response, jsonify, Response, stream_with_context, g, current_app, has_app_context,
+                   has_request_context, request_finished, before_render_template, template_rendered)
 from flask_sqlalchemy import SQLAlchemy
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import Markup, escape
 from datetime import datetime, timedelta  # Add timedelta to the import
+from collections import OrderedDict
+import bisect
+import click
+import csv
+import functools
+import gzip
+import hmac
+import importlib
+import io
+import json
 import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
 from urllib.parse import urlparse, parse_qs
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'change-this-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///cultural_tours.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+@functools.cache
+def optional_module(name):
+    """`name` imported on first use, or None when it isn't installed.
+
+    brotli (Content-Encoding: br), numpy (package quotes) and redis (shared
+    rate limits) are only loaded by the first request that needs them, not
+    by every worker and CLI command on import.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+# ------------ DATABASE ENGINE ------------
+# Everything here comes from the environment, so one build runs on the
+# bundled SQLite file or on a pooled PostgreSQL server.
+
+def database_uri(environ=os.environ):
+    uri = environ.get('DATABASE_URL', 'sqlite:///cultural_tours.db')
+    # Heroku-style URLs; SQLAlchemy only accepts postgresql://
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for `uri`.
+
+    SQLite keeps SQLAlchemy's default pool and is tuned through the
+    pragmas applied by apply_sqlite_pragmas. Server databases get a sized
+    pool that drops dead connections before use.
+    """
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 10)),  # per worker process
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', 10)),  # seconds to wait for a free connection
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),  # seconds, under most server idle timeouts
+        'pool_pre_ping': environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+
+
+def sqlite_pragmas(environ=os.environ):
+    """Pragmas run on every new SQLite connection; an empty value skips one.
+
+    WAL lets readers work while a booking commits instead of failing with
+    "database is locked"; synchronous=NORMAL is durable in WAL mode except
+    for the last commits on power loss; busy_timeout makes writers queue
+    for the lock; mmap serves reads straight from the page cache.
+    """
+    return {
+        'journal_mode': environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'),
+        'mmap_size': environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    }
+
+
+# ------------ APPLICATION ------------
+# Importing this module only declares things; create_app() at the bottom
+# builds an application from them, so a prefork server can build it once
+# before forking and tests can build as many isolated ones as they like.
+
+def default_config(environ=os.environ):
+    """Settings every app starts from; create_app(config) overrides them."""
+    return {
+        'SECRET_KEY': 'change-this-secret-key',
+        'SQLALCHEMY_DATABASE_URI': database_uri(environ),
+        'SQLITE_PRAGMAS': sqlite_pragmas(environ),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'CATALOG_CACHE_SIZE': 256,  # max cached catalog entries
+        'CATALOG_CACHE_TTL': 300,  # seconds
+        'CATALOG_VERSION_CHECK_INTERVAL': 1,  # seconds between reads of the stored catalog version, 0 = every request
+        'PAGE_CACHE_SIZE': 128,  # max cached rendered pages
+        'PAGE_CACHE_TTL': 300,  # seconds
+        'QUOTE_CACHE_SIZE': 1024,  # max cached package quote tables
+        'COMPRESS_MIN_SIZE': 1024,  # bytes; smaller responses are sent as-is
+        'COMPRESS_LEVEL': 6,
+        'ADMIN_PAGE_SIZE': 50,  # rows per admin listing page
+        'STATS_RECONCILE_INTERVAL': 3600,  # seconds between stats rebuilds, 0 to disable
+        'STATS_DAYS': 14,  # days shown in the dashboard daily breakdown
+        'EXPORT_CHUNK_SIZE': 1000,  # rows fetched and written per export chunk
+        'METRICS_ENABLED': environ.get('METRICS_ENABLED') == '1',  # per-endpoint timings on /admin/metrics
+        'METRICS_TOKEN': environ.get('METRICS_TOKEN'),  # bearer token for scrapers, besides admin login
+        'SLOW_REQUEST_MS': 500,  # log requests slower than this while metrics are on
+        'REQUEST_QUERY_BUDGET': 25,  # and requests running more SQL statements than this
+        'API_PAGE_SIZE': 50,  # default items per JSON API page
+        'API_MAX_PAGE_SIZE': 200,  # cap on ?limit= and on ?ids= per batch
+        'SMTP_HOST': environ.get('SMTP_HOST', 'localhost'),  # customer emails go out through this server
+        'SMTP_PORT': int(environ.get('SMTP_PORT', 25)),
+        'SMTP_USERNAME': environ.get('SMTP_USERNAME'),
+        'SMTP_PASSWORD': environ.get('SMTP_PASSWORD'),
+        'SMTP_STARTTLS': environ.get('SMTP_STARTTLS') == '1',
+        'NOTIFY_FROM': environ.get('NOTIFY_FROM', 'Cultural Tours <bookings@culturaltours.example>'),
+        'SMS_GATEWAY_URL': environ.get('SMS_GATEWAY_URL'),  # JSON {"to", "text"} is POSTed here; no SMS when unset
+        'NOTIFY_WORKERS': int(environ.get('NOTIFY_WORKERS', 1)),  # delivery threads, in `python app.py` or notify-worker
+        'NOTIFY_BATCH_SIZE': 50,  # notifications claimed (and sent over one SMTP connection) at a time
+        'NOTIFY_POLL_INTERVAL': 2,  # seconds an idle worker waits before looking again
+        'NOTIFY_LEASE': 120,  # seconds a claimed batch is hidden from other workers
+        'NOTIFY_MAX_ATTEMPTS': 8,  # then the notification is marked failed
+        'NOTIFY_RETRY_BASE': 30,  # seconds before the first retry, doubling after each failure
+        'NOTIFY_RETRY_MAX': 3600,  # longest wait between retries
+        'NOTIFY_TIMEOUT': 10,  # seconds, per SMTP / SMS gateway call
+        'ARCHIVE_AFTER_DAYS': int(environ.get('ARCHIVE_AFTER_DAYS', 365)),  # archive-bookings moves trips over this long
+        'ARCHIVE_BATCH_SIZE': 1000,  # bookings moved per archive transaction
+        'RATE_LIMIT_ENABLED': environ.get('RATE_LIMIT_ENABLED', '1') == '1',  # 429 for clients over RATE_LIMITS
+        'RATE_LIMIT_STORAGE_URL': environ.get('RATE_LIMIT_STORAGE_URL'),  # redis://... shares buckets between workers
+        'RATE_LIMIT_MAX_KEYS': 100000,  # buckets kept in process memory, least recently used dropped first
+        # "count/second|minute|hour": bursts of up to count, refilled evenly over the period
+        'RATE_LIMITS': {
+            'booking_ip': '60/minute',  # booking pages and submits per client IP
+            'booking_email': '5/minute',  # booking submits per customer email
+            'login_ip': '10/minute',  # admin login page and attempts per client IP
+            'login_user': '5/minute',  # admin login attempts per username
+        },
+        'TRUSTED_PROXIES': int(environ.get('TRUSTED_PROXIES', 0)),  # proxies whose X-Forwarded-For gives the client IP
+        # Compiled templates, shared by every worker on the machine; unset
+        # means <instance>/template-cache, empty turns it off
+        'TEMPLATE_CACHE_DIR': environ.get('TEMPLATE_CACHE_DIR'),
+    }
+
+
+db = SQLAlchemy()
+
+# Routes grouped by audience; create_app() registers all four
+public_bp = Blueprint('public', __name__)
+services_bp = Blueprint('services', __name__)
+api_bp = Blueprint('api', __name__)
+admin_bp = Blueprint('admin', __name__, cli_group=None)  # its commands sit directly under `flask`
+
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    pragmas = current_app.config['SQLITE_PRAGMAS'] if has_app_context() else sqlite_pragmas()
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        if value:
+            cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
 
 # ------------ MODELS ------------
 
@@ -26,6 +191,12 @@ class Place(db.Model):
     price_per_person = db.Column(db.Float, nullable=False, default=0.0)
     duration_days = db.Column(db.Integer, nullable=False, default=2)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        # ?state= filter of the places API, paged by id
+        db.Index('ix_place_state_id', 'state', 'id'),
+        # max(created_at) for the API's Last-Modified
+        db.Index('ix_place_created_at', 'created_at'),
+    )
 
 
 class Booking(db.Model):
@@ -40,6 +211,21 @@ class Booking(db.Model):
     special_requests = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), default='Pending')  # Pending / Confirmed / Rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # from the booking form
+
+    __table_args__ = (
+        # duplicate booking check in book_place
+        db.Index('ix_booking_email_travel_date_status', 'email', 'travel_date', 'status'),
+        # one active booking per email per day, enforced even under concurrent submits
+        db.Index('uq_booking_active_email_travel_date', 'email', 'travel_date', unique=True,
+                 sqlite_where=db.text("status IN ('Pending', 'Confirmed')"),
+                 postgresql_where=db.text("status IN ('Pending', 'Confirmed')")),
+        # admin listing keyset pagination
+        db.Index('ix_booking_created_at_id', 'created_at', 'id'),
+        db.Index('uq_booking_idempotency_key', 'idempotency_key', unique=True),
+        # trips past the retention window, in archive_batch()
+        db.Index('ix_booking_travel_date', 'travel_date'),
+    )
 # Add these new models after the existing ones in app.py
 
 class Hotel(db.Model):
@@ -50,11 +236,17 @@ class Hotel(db.Model):
     description = db.Column(db.Text, nullable=True)
     price_per_night = db.Column(db.Float, nullable=False, default=0.0)
     rating = db.Column(db.Float, nullable=True)  # 1-5 stars
+    total_rooms = db.Column(db.Integer, nullable=False, default=10, server_default='10')
     amenities = db.Column(db.String(300), nullable=True)  # comma separated
     image_url = db.Column(db.String(300), nullable=True)
     contact_info = db.Column(db.String(200), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_hotel_place_id', 'place_id'),
+        db.Index('ix_hotel_created_at_id', 'created_at', 'id'),
+    )
+
 class Transport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     place_id = db.Column(db.Integer, db.ForeignKey('place.id'), nullable=False)
@@ -69,6 +261,13 @@ class Transport(db.Model):
     contact_info = db.Column(db.String(200), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_transport_place_id', 'place_id'),
+        db.Index('ix_transport_created_at_id', 'created_at', 'id'),
+    )
+
+TRANSPORT_TYPES = ('bus', 'cab', 'train')
+
 class ServiceBooking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # Main booking reference
@@ -104,6 +303,125 @@ class ServiceBooking(db.Model):
     
     status = db.Column(db.String(20), default='Pending')  # Pending / Confirmed / Cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # from the booking form
+
+    __table_args__ = (
+        # conflict / duplicate checks in book_services
+        db.Index('ix_service_booking_email_hotel', 'customer_email', 'hotel_id', 'check_in_date'),
+        db.Index('ix_service_booking_email_transport', 'customer_email', 'transport_id', 'created_at'),
+        db.Index('ix_service_booking_email_place', 'customer_email', 'place_id', 'check_in_date'),
+        # one active service booking per email, place and check-in date
+        db.Index('uq_service_booking_active_email_place', 'customer_email', 'place_id', 'check_in_date',
+                 unique=True,
+                 sqlite_where=db.text("status IN ('Pending', 'Confirmed')"),
+                 postgresql_where=db.text("status IN ('Pending', 'Confirmed')")),
+        # admin listing keyset pagination
+        db.Index('ix_service_booking_created_at_id', 'created_at', 'id'),
+        db.Index('uq_service_booking_idempotency_key', 'idempotency_key', unique=True),
+        # stays past the retention window, and tour bookings still referenced, in archive_batch()
+        db.Index('ix_service_booking_check_out_date', 'check_out_date'),
+        db.Index('ix_service_booking_main_booking_id', 'main_booking_id'),
+    )
+
+class HotelNight(db.Model):
+    # Rooms held at a hotel for one night by Pending/Confirmed service
+    # bookings; kept in step with ServiceBooking by adjust_occupancy()
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    rooms_booked = db.Column(db.Integer, nullable=False, default=0)
+
+class DashboardStat(db.Model):
+    # Pre-aggregated admin dashboard counters, bumped in the same commit as
+    # the change they count and rebuilt from scratch by rebuild_stats()
+    scope = db.Column(db.String(10), primary_key=True)  # all / place / day
+    scope_key = db.Column(db.String(20), primary_key=True)  # '' / place id / YYYY-MM-DD
+    metric = db.Column(db.String(50), primary_key=True)  # e.g. tour_bookings_Pending
+    value = db.Column(db.Float, nullable=False, default=0.0)
+
+class CatalogVersion(db.Model):
+    # Single row counting catalog writes, bumped in the same commit as the
+    # write so every worker and CLI process can see that its caches are stale
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Notification(db.Model):
+    # Outbox of customer emails and SMS, added in the same commit as the
+    # booking change they announce and sent later by deliver_notifications()
+    id = db.Column(db.Integer, primary_key=True)
+    booking_kind = db.Column(db.String(10), nullable=False)  # tour / service
+    booking_id = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(20), nullable=False)  # created / status
+    channel = db.Column(db.String(10), nullable=False)  # email / sms
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending / sent / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)  # token of the worker holding the lease
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # due notifications, in claim_notifications()
+        db.Index('ix_notification_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_notification_claimed_by', 'claimed_by'),
+    )
+
+# Bookings whose trip ended more than ARCHIVE_AFTER_DAYS ago, moved out of
+# the live tables by archive_bookings(). Same columns and ids as the live
+# rows plus archived_at; only the admin listings and exports read them.
+
+class BookingArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id'), nullable=False)
+    place = db.relationship('Place')
+    name = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    travel_date = db.Column(db.Date, nullable=False)
+    num_people = db.Column(db.Integer, nullable=False)
+    special_requests = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_booking_archive_created_at_id', 'created_at', 'id'),
+    )
+
+class ServiceBookingArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    main_booking_id = db.Column(db.Integer, nullable=True)  # live or archived booking id
+    customer_name = db.Column(db.String(120), nullable=True)
+    customer_email = db.Column(db.String(120), nullable=True)
+    customer_phone = db.Column(db.String(20), nullable=True)
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id'), nullable=False)
+    place = db.relationship('Place')
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotel.id'), nullable=True)
+    hotel = db.relationship('Hotel')
+    transport_id = db.Column(db.Integer, db.ForeignKey('transport.id'), nullable=True)
+    transport = db.relationship('Transport')
+    check_in_date = db.Column(db.Date, nullable=True)
+    check_out_date = db.Column(db.Date, nullable=True)
+    num_people = db.Column(db.Integer, nullable=False)
+    num_rooms = db.Column(db.Integer, nullable=False)
+    num_days = db.Column(db.Integer, nullable=False)
+    special_requests = db.Column(db.Text, nullable=True)
+    hotel_total = db.Column(db.Float, nullable=False)
+    transport_total = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_service_booking_archive_created_at_id', 'created_at', 'id'),
+    )
 
 # ------------ SIMPLE ADMIN CONFIG ------------
 
@@ -111,16 +429,1651 @@ ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"  # change in production
 
 
+BOOKING_STATUSES = ['Pending', 'Confirmed', 'Rejected']
+SERVICE_BOOKING_STATUSES = ['Pending', 'Confirmed', 'Cancelled']
+
+
 def login_required(f):
     from functools import wraps
     @wraps(f)
     def wrapper(*args, **kwargs):
         if not session.get('admin_logged_in'):
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('admin.admin_login'))
         return f(*args, **kwargs)
     return wrapper
 
 
+# ------------ CATALOG LOADING ------------
+
+def load_catalog(state_filter=None):
+    """Places with their hotels and transports, in a fixed number of queries.
+
+    selectinload issues one extra IN (...) query per relationship instead of
+    one query per place, so the home page costs 3 round trips however many
+    places there are.
+    """
+    query = Place.query.options(
+        db.selectinload(Place.hotels),
+        db.selectinload(Place.transports)
+    )
+    if state_filter:
+        query = query.filter_by(state=state_filter)
+    return query.order_by(Place.created_at.desc()).all()
+
+
+def load_place(place_id):
+    """A single place with its hotels and transports, or None."""
+    return Place.query.options(
+        db.selectinload(Place.hotels),
+        db.selectinload(Place.transports)
+    ).filter_by(id=place_id).first()
+
+
+def _detach(places):
+    # Cached objects outlive the request session, so take them out of it
+    # before a later commit in the same request can expire their attributes.
+    for place in places:
+        for obj in [place] + list(place.hotels) + list(place.transports):
+            if obj in db.session:
+                db.session.expunge(obj)
+    return places
+
+
+# ------------ CATALOG CACHE ------------
+
+class CatalogCache:
+    """Small LRU + TTL cache for catalog reads.
+
+    Every entry remembers the cache version it was loaded under; catalog
+    writes bump the version through invalidate(), which makes all older
+    entries stale at once without walking the cache.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == self.version and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            version = self.version
+
+        value = loader()
+
+        with self._lock:
+            # Don't store a value loaded before an invalidation that raced it
+            if version == self.version:
+                self._entries[key] = (version, now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# The caches belong to the application (see create_app), so two apps in one
+# process never serve each other's entries
+catalog_cache = LocalProxy(lambda: current_app.extensions['catalog_cache'])
+
+
+def cached_catalog(state_filter=None):
+    return catalog_cache.get(('catalog', state_filter or None),
+                             lambda: _detach(load_catalog(state_filter)))
+
+
+def cached_place(place_id):
+    def loader():
+        place = load_place(place_id)
+        return _detach([place])[0] if place else None
+    return catalog_cache.get(('place', place_id), loader)
+
+
+def get_place_or_404(place_id):
+    place = cached_place(place_id)
+    if place is None:
+        abort(404)
+    return place
+
+
+# Rendered HTML of the anonymous public pages, dropped on the same admin writes
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+
+# Package quotes per (place, nights, people, rooms); kept apart so a burst of
+# quote inputs can't evict the catalog entries
+quote_cache = LocalProxy(lambda: current_app.extensions['quote_cache'])
+
+
+def cached_page(key_func):
+    """Serve a public view from page_cache.
+
+    Only anonymous visitors without pending flash messages get the shared
+    copy; admins see extra nav links and flashes are per-user, so those
+    requests are always rendered fresh and never stored.
+    """
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if session.get('admin_logged_in') or session.get('_flashes'):
+                return f(*args, **kwargs)
+            return page_cache.get(key_func(*args, **kwargs), lambda: f(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+# Each process caches the catalog on its own, so a write also bumps the
+# stored CatalogVersion row; sync_catalog_version() reads it at most every
+# CATALOG_VERSION_CHECK_INTERVAL seconds (one primary key lookup) and drops
+# this process's caches once another worker or `flask import-catalog` has
+# moved it on.
+
+def bump_catalog_version():
+    """Count a catalog write; call before the commit that makes it."""
+    now = datetime.utcnow()
+    db.session.execute(_insert_ignore(CatalogVersion), [{'id': 1, 'version': 0, 'changed_at': now}])
+    table = CatalogVersion.__table__
+    db.session.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1, changed_at=now))
+
+
+def stored_catalog_version():
+    """(version, changed_at) of the last committed catalog write."""
+    row = db.session.execute(
+        db.select(CatalogVersion.version, CatalogVersion.changed_at).where(CatalogVersion.id == 1)
+    ).first()
+    return (row.version, row.changed_at) if row else (0, None)
+
+
+def sync_catalog_version(force=False):
+    """Drop the catalog caches if the stored version has moved on."""
+    seen = current_app.extensions['catalog_version']
+    now = time.monotonic()
+    if not force and now < seen['checked'] + current_app.config['CATALOG_VERSION_CHECK_INTERVAL']:
+        return
+    version, changed_at = stored_catalog_version()
+    seen['checked'] = now
+    if (version, changed_at) != (seen['version'], seen['changed_at']):
+        catalog_cache.invalidate()
+        page_cache.invalidate()
+        quote_cache.invalidate()
+        seen['version'], seen['changed_at'] = version, changed_at
+
+
+def catalog_changed():
+    """Call after committing a write to places, hotels or transports.
+
+    The commit must include bump_catalog_version(); this process picks the
+    new version up at once, the others on their next check.
+    """
+    sync_catalog_version(force=True)
+
+
+# ------------ PLACE SEARCH ------------
+# An SQLite FTS5 table with one row per place (rowid = place.id) holding
+# the place's text and its hotels' amenities. update_search_index() rewrites
+# the touched places in the same transaction as each catalog write. Without
+# FTS5 (e.g. on PostgreSQL) search falls back to matching the cached catalog.
+
+SEARCH_COLUMNS = ['name', 'city', 'short_intro', 'description', 'culture_description', 'amenities']
+SEARCH_WEIGHTS = [10.0, 5.0, 3.0, 1.0, 1.0, 0.5]  # bm25() weight per column
+SEARCH_MAX_TERMS = 8
+
+# engine -> whether place_search exists; per engine, as every in-memory
+# test app has the same url
+_search_index = weakref.WeakKeyDictionary()
+
+
+def search_enabled():
+    key = db.engine
+    if key not in _search_index:
+        _search_index[key] = (db.engine.dialect.name == 'sqlite'
+                              and db.inspect(db.engine).has_table('place_search'))
+    return _search_index[key]
+
+
+def create_search_index():
+    """Create the FTS5 table if the database supports it; True if created."""
+    if db.engine.dialect.name != 'sqlite' or db.inspect(db.engine).has_table('place_search'):
+        return False
+    try:
+        with db.engine.begin() as connection:
+            # prefix='2 3' keeps short prefix queries off a full term scan
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE place_search USING fts5({', '.join(SEARCH_COLUMNS)}, "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    except OperationalError:
+        # SQLite built without FTS5
+        return False
+    _search_index[db.engine] = True
+    return True
+
+
+_SEARCH_ROWS = f"""
+    SELECT p.id, p.name, p.city, p.short_intro, p.description, p.culture_description,
+           (SELECT group_concat(h.amenities, ' ') FROM hotel h WHERE h.place_id = p.id)
+    FROM place p"""
+
+
+def update_search_index(place_ids):
+    """Re-index the given places (added, edited, deleted or with hotel changes)."""
+    place_ids = sorted({int(place_id) for place_id in place_ids if place_id})
+    if not place_ids or not search_enabled():
+        return
+    params = {'ids': place_ids}
+    db.session.flush()
+    db.session.execute(db.text("DELETE FROM place_search WHERE rowid IN :ids")
+                       .bindparams(db.bindparam('ids', expanding=True)), params)
+    db.session.execute(db.text(f"INSERT INTO place_search(rowid, {', '.join(SEARCH_COLUMNS)}) "
+                               f"{_SEARCH_ROWS} WHERE p.id IN :ids")
+                       .bindparams(db.bindparam('ids', expanding=True)), params)
+
+
+def rebuild_search_index():
+    """Rewrite the whole index from the place and hotel tables."""
+    if not search_enabled():
+        return 0
+    db.session.execute(db.text("DELETE FROM place_search"))
+    db.session.execute(db.text(f"INSERT INTO place_search(rowid, {', '.join(SEARCH_COLUMNS)}) "
+                               f"{_SEARCH_ROWS}"))
+    count = db.session.execute(db.text("SELECT count(*) FROM place_search")).scalar()
+    db.session.commit()
+    return count
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')[:SEARCH_MAX_TERMS]
+
+
+def _search_texts(place):
+    return [place.short_intro, place.description, place.culture_description,
+            *[hotel.amenities for hotel in place.hotels]]
+
+
+def term_pattern(terms):
+    return re.compile(r'(?<!\w)(?:%s)\w*' % '|'.join(map(re.escape, terms)), re.IGNORECASE)
+
+
+def highlight_snippet(place, pattern, width=160):
+    """The first stretch of `place`'s text that `pattern` (term_pattern())
+    finds, with every match marked up, or None if only the name or city
+    matched.
+
+    Built from the cached place rather than FTS5's snippet(), which costs
+    more than the ranking query itself once there are dozens of results.
+    """
+    for text in filter(None, _search_texts(place)):
+        found = pattern.search(text)
+        if not found:
+            continue
+        begin = max(text.rfind(' ', 0, max(found.start() - width // 3, 0)) + 1, 0)
+        stop = text.find(' ', min(begin + width, len(text)))
+        stop = len(text) if stop == -1 else stop
+        window = text[begin:stop]
+        parts, last = ['… ' if begin else ''], 0
+        for match in pattern.finditer(window):
+            parts += [escape(window[last:match.start()]), '<mark>', escape(match.group()), '</mark>']
+            last = match.end()
+        parts += [escape(window[last:]), ' …' if stop < len(text) else '']
+        return Markup(''.join(map(str, parts)))
+    return None
+
+
+def _rank_fallback(places, terms, limit):
+    # Same prefix-per-word semantics as the FTS5 query, over the cached catalog
+    patterns = [re.compile(r'(?<!\w)%s' % re.escape(term), re.IGNORECASE) for term in terms]
+    scored = []
+    for place in places.values():
+        fields = [place.name, place.city or ''] + [text or '' for text in _search_texts(place)]
+        if all(any(pattern.search(field) for field in fields) for pattern in patterns):
+            scored.append((-sum(bool(pattern.search(place.name)) for pattern in patterns), place.id))
+    return [place_id for _, place_id in sorted(scored)[:limit]]
+
+
+def search_places(query, state_filter=None, limit=50):
+    """[(place, snippet)] matching every word of `query` as a prefix, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    places = catalog_cache.get(('catalog_by_id', state_filter or None),
+                               lambda: {place.id: place for place in cached_catalog(state_filter)})
+    if search_enabled():
+        # Every term quoted, so user input can't inject FTS5 query syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        state_join = "JOIN place ON place.id = place_search.rowid AND place.state = :state" if state_filter else ""
+        sql = f"""
+            SELECT place_search.rowid FROM place_search {state_join}
+            WHERE place_search MATCH :match
+            ORDER BY bm25(place_search, {', '.join(map(str, SEARCH_WEIGHTS))})
+            LIMIT :limit"""
+        place_ids = db.session.execute(
+            db.text(sql), {'match': match, 'state': state_filter, 'limit': limit}).scalars()
+    else:
+        place_ids = _rank_fallback(places, terms, limit)
+    pattern = term_pattern(terms)
+    return [(places[place_id], highlight_snippet(places[place_id], pattern))
+            for place_id in place_ids if place_id in places]
+
+
+# ------------ CATALOG FACETS ------------
+# Each facet value is a bitset over the cached catalog held in a Python int
+# (bit i = i-th place), so filtering and counting are a few big-int ANDs
+# and bit_count()s per request. The index lives in catalog_cache and is
+# rebuilt from the cached catalog after catalog_changed(), never per request.
+
+def _hotel_rating(minimum):
+    return lambda place: any((hotel.rating or 0) >= minimum for hotel in place.hotels)
+
+
+def _hotel_price(low, high):
+    return lambda place: any(low <= hotel.price_per_night and (high is None or hotel.price_per_night < high)
+                             for hotel in place.hotels)
+
+
+def _transport(transport_type):
+    return lambda place: any(t.transport_type == transport_type for t in place.transports)
+
+
+# (facet, label, [(value, label, test(place))]); values within a facet are
+# OR-ed together, facets are AND-ed
+FACETS = [
+    ('price', 'Price per person', [
+        ('0-2000', 'Under ₹2,000', lambda place: place.price_per_person < 2000),
+        ('2000-5000', '₹2,000 – ₹5,000', lambda place: 2000 <= place.price_per_person < 5000),
+        ('5000-10000', '₹5,000 – ₹10,000', lambda place: 5000 <= place.price_per_person < 10000),
+        ('10000-', '₹10,000 and up', lambda place: place.price_per_person >= 10000),
+    ]),
+    ('duration', 'Duration', [
+        ('1-2', '1–2 days', lambda place: place.duration_days <= 2),
+        ('3-4', '3–4 days', lambda place: 3 <= place.duration_days <= 4),
+        ('5-', '5 days or more', lambda place: place.duration_days >= 5),
+    ]),
+    ('rating', 'Hotel rating', [
+        ('3', '3★ and up', _hotel_rating(3)),
+        ('4', '4★ and up', _hotel_rating(4)),
+        ('4.5', '4.5★ and up', _hotel_rating(4.5)),
+    ]),
+    ('hotel_price', 'Hotel price per night', [
+        ('0-1500', 'Under ₹1,500', _hotel_price(0, 1500)),
+        ('1500-3000', '₹1,500 – ₹3,000', _hotel_price(1500, 3000)),
+        ('3000-6000', '₹3,000 – ₹6,000', _hotel_price(3000, 6000)),
+        ('6000-', '₹6,000 and up', _hotel_price(6000, None)),
+    ]),
+    ('transport', 'Transport', [
+        (transport_type, transport_type.title(), _transport(transport_type))
+        for transport_type in TRANSPORT_TYPES
+    ]),
+]
+
+
+class FacetIndex:
+    """Facet bitsets over one list of places (the cached catalog)."""
+
+    def __init__(self, places):
+        self.places = places
+        self.everything = (1 << len(places)) - 1
+        self.positions = {place.id: i for i, place in enumerate(places)}
+        # Built as '0'/'1' digit strings and converted once; OR-ing single
+        # bits into a growing int would be quadratic in the catalog size
+        digits = {facet: {value: bytearray(b'0' * len(places)) for value, _, _ in options}
+                  for facet, _, options in FACETS}
+        for i, place in enumerate(places):
+            for facet, _, options in FACETS:
+                for value, _, test in options:
+                    if test(place):
+                        digits[facet][value][i] = ord('1')
+        self.bits = {facet: {value: int(bytes(flags[::-1]) or b'0', 2) for value, flags in values.items()}
+                     for facet, values in digits.items()}
+
+    def mask_of(self, place_ids):
+        mask = 0
+        for place_id in place_ids:
+            if place_id in self.positions:
+                mask |= 1 << self.positions[place_id]
+        return mask
+
+    def select(self, selected, within=None):
+        """Places matching `selected` ({facet: [values]}) and facet counts.
+
+        Each facet's counts apply every other facet's selection but not its
+        own, so they show what ticking one more value would add. `within`
+        (a mask_of() result) narrows everything further, e.g. to search hits.
+        """
+        base = self.everything if within is None else within
+        masks = {}
+        for facet, values in selected.items():
+            known = [value for value in values if value in self.bits.get(facet, {})]
+            if known:
+                mask = 0
+                for value in known:
+                    mask |= self.bits[facet][value]
+                masks[facet] = mask
+
+        def narrowed(skip=None):
+            mask = base
+            for facet, facet_mask in masks.items():
+                if facet != skip:
+                    mask &= facet_mask
+            return mask
+
+        counts = {}
+        for facet, values in self.bits.items():
+            others = narrowed(skip=facet)
+            counts[facet] = {value: (bits & others).bit_count() for value, bits in values.items()}
+        return self.places_in(narrowed()), counts
+
+    def places_in(self, mask):
+        # Walk the set bits through the binary string: str.find runs in C
+        digits = bin(mask)[:1:-1]
+        places = []
+        i = digits.find('1')
+        while i != -1:
+            places.append(self.places[i])
+            i = digits.find('1', i + 1)
+        return places
+
+
+def facet_index(state_filter=None):
+    return catalog_cache.get(('facets', state_filter or None),
+                             lambda: FacetIndex(cached_catalog(state_filter)))
+
+
+def selected_facets(args):
+    """{facet: [values]} ticked in `args`; unknown values are dropped and
+    the rest kept once each, in FACETS order."""
+    selected = {}
+    for facet, _, options in FACETS:
+        ticked = set(args.getlist(facet))
+        values = [value for value, _, _ in options if value in ticked]
+        if values:
+            selected[facet] = values
+    return selected
+
+
+def index_cache_key():
+    """page_cache key from only the args index() reads, normalised, so
+    junk or reordered query parameters can't push real pages out."""
+    selected = selected_facets(request.args)
+    return ('index', request.args.get('state') or None, request.args.get('q', '').strip(),
+            tuple((facet, tuple(values)) for facet, values in selected.items()))
+
+
+# ------------ CONDITIONAL GET & COMPRESSION ------------
+
+# Validators come from the stored CatalogVersion (as last synced by this
+# process), so every worker hands out the same ETag for the same catalog.
+
+def catalog_etag():
+    seen = current_app.extensions['catalog_version']
+    if seen['changed_at'] is None:
+        return f"catalog-{seen['version']}"
+    return f"catalog-{seen['version']}-{seen['changed_at']:%Y%m%d%H%M%S%f}"
+
+
+def catalog_changed_at():
+    return current_app.extensions['catalog_version']['changed_at']
+
+
+def _newest(*timestamps):
+    return max((ts for ts in timestamps if ts is not None), default=None)
+
+
+def catalog_last_modified(state_filter=None):
+    def loader():
+        places = cached_catalog(state_filter)
+        stamps = [catalog_changed_at()]
+        for place in places:
+            stamps.append(place.created_at)
+            stamps.extend(h.created_at for h in place.hotels)
+            stamps.extend(t.created_at for t in place.transports)
+        return _newest(*stamps)
+    return catalog_cache.get(('last_modified', state_filter or None), loader)
+
+
+def catalog_updated_at():
+    """Newest catalog write or row, without loading the catalog.
+
+    The stored changed_at covers edits and deletes; max(created_at) per
+    table (one index probe each) covers rows added before CatalogVersion
+    existed.
+    """
+    def loader():
+        newest = db.session.execute(db.select(
+            db.select(db.func.max(Place.created_at)).scalar_subquery(),
+            db.select(db.func.max(Hotel.created_at)).scalar_subquery(),
+            db.select(db.func.max(Transport.created_at)).scalar_subquery()
+        )).one()
+        return _newest(catalog_changed_at(), *newest)
+    return catalog_cache.get(('updated_at',), loader)
+
+
+def place_last_modified(place_id):
+    place = get_place_or_404(place_id)
+    return _newest(
+        catalog_changed_at(),
+        place.created_at,
+        *[h.created_at for h in place.hotels],
+        *[t.created_at for t in place.transports]
+    )
+
+
+def conditional_page(last_modified_func):
+    """Answer If-None-Match / If-Modified-Since with 304 before rendering.
+
+    Edits don't touch created_at, so the validators also fold in the stored
+    catalog version and the time of the last catalog write. Skipped for the
+    same admin/flash requests that bypass cached_page.
+    """
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if session.get('admin_logged_in') or session.get('_flashes'):
+                return f(*args, **kwargs)
+            etag = catalog_etag()
+            last_modified = last_modified_func(*args, **kwargs)
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(f(*args, **kwargs))
+            else:
+                response = current_app.response_class(status=304)
+            # Weak, because the same tag covers gzip/br/identity encodings
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def compress_response(response):
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in ('text/html', 'application/json')
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    brotli = optional_module('brotli') if _accepts('br') else None
+    if brotli is not None:
+        response.set_data(brotli.compress(body, quality=4))
+        response.headers['Content-Encoding'] = 'br'
+    elif _accepts('gzip'):
+        response.set_data(gzip.compress(body, compresslevel=current_app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# ------------ REQUEST METRICS ------------
+# Opt-in with METRICS_ENABLED. A request collects its SQL statements and
+# template render time in flask.g; request_finished (after compression)
+# folds them into per-endpoint totals, served on /admin/metrics in the
+# Prometheus text format. Requests over SLOW_REQUEST_MS or
+# REQUEST_QUERY_BUDGET are logged with their statements. The hooks and
+# signal receivers below are connected by create_app().
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+MAX_LOGGED_STATEMENTS = 15
+
+# (metric name, help, key in the per-endpoint totals)
+METRIC_COUNTERS = [
+    ('sql_queries_total', 'SQL statements executed.', 'queries'),
+    ('sql_duration_seconds_total', 'Time spent in SQL statements.', 'sql_seconds'),
+    ('template_render_seconds_total', 'Time spent rendering templates.', 'template_seconds'),
+    ('response_bytes_total', 'Response body bytes as sent, streamed bodies excluded.', 'bytes'),
+    ('slow_requests_total', 'Requests over the latency or query budget.', 'slow'),
+]
+
+
+class RequestMetrics:
+    """Per-endpoint latency histogram and counters, safe across threads."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, prefix='cultural_tour_'):
+        self.buckets = buckets
+        self.prefix = prefix
+        self._endpoints = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, seconds, **totals):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = dict(
+                    {key: 0 for _, _, key in METRIC_COUNTERS},
+                    buckets=[0] * (len(self.buckets) + 1), count=0, seconds=0.0)
+            entry['buckets'][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            for key, value in totals.items():
+                entry[key] += value
+            self._statuses[endpoint, status] = self._statuses.get((endpoint, status), 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._statuses.clear()
+
+    def stats(self):
+        """{endpoint: totals} copy; histogram buckets are per bucket, not cumulative."""
+        with self._lock:
+            return {name: dict(entry, buckets=list(entry['buckets']))
+                    for name, entry in sorted(self._endpoints.items())}
+
+    def prometheus(self):
+        endpoints = self.stats()
+        with self._lock:
+            statuses = sorted(self._statuses.items())
+
+        name = f'{self.prefix}requests_total'
+        lines = [f'# HELP {name} Requests by endpoint and status.', f'# TYPE {name} counter']
+        lines += [f'{name}{{endpoint="{endpoint}",status="{status}"}} {count}'
+                  for (endpoint, status), count in statuses]
+
+        name = f'{self.prefix}request_duration_seconds'
+        lines += [f'# HELP {name} Request latency by endpoint.', f'# TYPE {name} histogram']
+        for endpoint, entry in endpoints.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), entry['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {entry["seconds"]:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {entry["count"]}')
+
+        for suffix, help_text, key in METRIC_COUNTERS:
+            name = f'{self.prefix}{suffix}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{endpoint="{endpoint}"}} {entry[key]:.6f}' if isinstance(entry[key], float)
+                      else f'{name}{{endpoint="{endpoint}"}} {entry[key]}' for endpoint, entry in endpoints.items()]
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = LocalProxy(lambda: current_app.extensions['request_metrics'])
+
+
+def _current_metrics():
+    return g.get('request_metrics') if has_request_context() else None
+
+
+def start_request_metrics():
+    if current_app.config['METRICS_ENABLED']:
+        g.request_metrics = {'started': time.perf_counter(), 'statements': [],
+                             'sql_seconds': 0.0, 'template_seconds': 0.0}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    if _current_metrics() is not None:
+        conn.info['statement_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current_metrics()
+    started = conn.info.pop('statement_started', None)
+    if metrics is not None and started is not None:
+        elapsed = time.perf_counter() - started
+        metrics['sql_seconds'] += elapsed
+        metrics['statements'].append((elapsed, statement))
+
+
+def _template_started(sender, template, context, **extra):
+    metrics = _current_metrics()
+    if metrics is not None:
+        metrics['template_started'] = time.perf_counter()
+
+
+def _template_finished(sender, template, context, **extra):
+    metrics = _current_metrics()
+    if metrics is not None and 'template_started' in metrics:
+        metrics['template_seconds'] += time.perf_counter() - metrics.pop('template_started')
+
+
+def _statement_report(statements):
+    # Same statement text grouped, so an N+1 loop shows up as one line xN
+    grouped = {}
+    for elapsed, statement in statements:
+        text = ' '.join(statement.split())
+        count, total = grouped.get(text, (0, 0.0))
+        grouped[text] = (count + 1, total + elapsed)
+    worst = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)
+    return '\n'.join(f"  {total * 1000:8.1f} ms  x{count:<3} {text[:300]}"
+                     for text, (count, total) in worst[:MAX_LOGGED_STATEMENTS])
+
+
+def record_request_metrics(sender, response, **extra):
+    metrics = g.pop('request_metrics', None)
+    if metrics is None:
+        return
+    seconds = time.perf_counter() - metrics['started']
+    statements = metrics['statements']
+    endpoint = request.endpoint or 'unmatched'
+    slow = (seconds * 1000 > current_app.config['SLOW_REQUEST_MS']
+            or len(statements) > current_app.config['REQUEST_QUERY_BUDGET'])
+    request_metrics.record(
+        endpoint, response.status_code, seconds,
+        queries=len(statements), sql_seconds=metrics['sql_seconds'],
+        template_seconds=metrics['template_seconds'],
+        bytes=response.content_length or (0 if response.is_streamed else response.calculate_content_length() or 0),
+        slow=int(slow))
+    if slow:
+        current_app.logger.warning(
+            "Slow request %s %s (%s): %.0f ms, %d SQL statement(s) in %.0f ms\n%s",
+            request.method, request.full_path.rstrip("?"), endpoint, seconds * 1000, len(statements),
+            metrics['sql_seconds'] * 1000, _statement_report(statements))
+
+
+def metrics_token_ok():
+    token = current_app.config['METRICS_TOKEN']
+    sent = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode())
+
+
+# ------------ RATE LIMITING ------------
+# Token buckets in front of the booking forms and the admin login. The
+# check runs before the view, so a throttled request never reaches the
+# database; it is answered 429 with Retry-After.
+
+RATE_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+
+@functools.cache
+def parse_rate(spec):
+    """'5/minute' -> (tokens refilled per second, burst size)."""
+    count, _, period = spec.partition('/')
+    return int(count) / RATE_PERIODS[period], int(count)
+
+
+class RateLimiter:
+    """Token buckets held in this process, one per (rule, key).
+
+    A bucket holds up to `burst` tokens and refills at `rate` per second;
+    each request takes one. Buckets sit in an LRU of at most max_keys, so a
+    flood of distinct IPs or emails can't grow memory without bound (an
+    evicted bucket just starts full again). Every check is O(1).
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.evictions = 0
+        self.errors = 0
+        self._buckets = OrderedDict()
+        self._counts = {}  # (rule, allowed) -> requests
+        self._lock = threading.Lock()
+
+    def hit(self, rule, key, rate, burst):
+        """Take a token; returns (allowed, seconds until the next one)."""
+        allowed, retry_after = self._take(rule, key, rate, burst)
+        with self._lock:
+            self._counts[rule, allowed] = self._counts.get((rule, allowed), 0) + 1
+        return allowed, retry_after
+
+    def _take(self, rule, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop((rule, key), (burst, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            allowed = tokens >= 1
+            self._buckets[rule, key] = (tokens - allowed, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._counts.clear()
+
+    def stats(self):
+        with self._lock:
+            rules = {}
+            for (rule, allowed), count in self._counts.items():
+                rules.setdefault(rule, {'allowed': 0, 'throttled': 0})['allowed' if allowed else 'throttled'] += count
+            return {'keys': len(self._buckets), 'evictions': self.evictions, 'errors': self.errors,
+                    'rules': dict(sorted(rules.items()))}
+
+    def prometheus(self, prefix='cultural_tour_'):
+        stats = self.stats()
+        name = f'{prefix}rate_limit_requests_total'
+        lines = [f'# HELP {name} Rate-limited requests by rule and outcome.', f'# TYPE {name} counter']
+        lines += [f'{name}{{rule="{rule}",outcome="{outcome}"}} {count}'
+                  for rule, counts in stats['rules'].items() for outcome, count in counts.items()]
+        name = f'{prefix}rate_limit_store_errors_total'
+        lines += [f'# HELP {name} Checks let through because the shared store failed.',
+                  f'# TYPE {name} counter', f'{name} {stats["errors"]}']
+        return '\n'.join(lines) + '\n'
+
+
+class RedisRateLimiter(RateLimiter):
+    """The same token buckets in Redis, shared by every worker and host.
+
+    One script call per check refills and takes atomically, on the Redis
+    server's clock; a bucket expires once it would be full again. When
+    Redis can't be reached the request is let through and counted in
+    `errors`, so an outage doesn't take the booking forms down with it.
+    """
+
+    SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = math.min(burst, (tonumber(state[1]) or burst) + math.max(now - (tonumber(state[2]) or now), 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url, prefix='cultural_tour:rate:'):
+        super().__init__(max_keys=0)
+        redis = optional_module('redis')
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        self._script = self.client.register_script(self.SCRIPT)
+        self._store_errors = (redis.RedisError, OSError)
+
+    def _take(self, rule, key, rate, burst):
+        try:
+            allowed, tokens = self._script(keys=[f'{self.prefix}{rule}:{key}'], args=[rate, burst])
+        except self._store_errors as exc:
+            with self._lock:
+                self.errors += 1
+            current_app.logger.warning("Rate limit store unavailable, letting the request through: %s", exc)
+            return True, 0.0
+        return bool(allowed), 0.0 if allowed else (1 - float(tokens)) / rate
+
+
+def make_rate_limiter(app):
+    """Buckets in Redis when RATE_LIMIT_STORAGE_URL is set, else in this process."""
+    url = app.config['RATE_LIMIT_STORAGE_URL']
+    if url:
+        if optional_module('redis'):
+            return RedisRateLimiter(url)
+        app.logger.warning("RATE_LIMIT_STORAGE_URL is set but redis isn't installed; rate limits are per process")
+    return RateLimiter(app.config['RATE_LIMIT_MAX_KEYS'])
+
+
+rate_limiter = LocalProxy(lambda: current_app.extensions['rate_limiter'])
+
+
+def client_ip():
+    return request.remote_addr
+
+
+def form_field(name):
+    """Bucket key from a submitted form field, normalised; None when absent."""
+    def key():
+        return request.form.get(name, '').strip().lower() or None
+    return key
+
+
+def rate_limited(*rules):
+    """Answer 429 when any (rule, key_func) bucket is out of tokens.
+
+    `rule` names a RATE_LIMITS entry; `key_func` picks the bucket (client
+    IP, submitted email) and returns None to leave the rule out, as GETs
+    do for form fields.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if current_app.config['RATE_LIMIT_ENABLED']:
+                limits = current_app.config['RATE_LIMITS']
+                for rule, key_func in rules:
+                    key = key_func()
+                    if key is None:
+                        continue
+                    allowed, retry_after = rate_limiter.hit(rule, key, *parse_rate(limits[rule]))
+                    if not allowed:
+                        abort(429, retry_after=int(retry_after) + 1)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------ BOOKING CHECKS ------------
+# Each of these is backed by one of the composite indexes declared on the
+# models; `flask check-query-plans` verifies that none of them table-scans.
+
+ACTIVE_STATUSES = ['Pending', 'Confirmed']
+
+
+def duplicate_tour_booking(email, travel_date):
+    return Booking.query.filter(
+        Booking.email == email,
+        Booking.travel_date == travel_date,
+        Booking.status.in_(ACTIVE_STATUSES)
+    )
+
+
+def hotel_full(hotel, check_in_date, check_out_date, rooms_wanted):
+    """Nights in the stay that can't take `rooms_wanted` more rooms."""
+    return HotelNight.query.filter(
+        HotelNight.hotel_id == hotel.id,
+        HotelNight.night >= check_in_date,
+        HotelNight.night < check_out_date,
+        HotelNight.rooms_booked > hotel.total_rooms - rooms_wanted
+    )
+
+
+def duplicate_hotel_booking(email, hotel_id, check_in_date):
+    return ServiceBooking.query.filter(
+        ServiceBooking.customer_email == email,
+        ServiceBooking.hotel_id == hotel_id,
+        ServiceBooking.check_in_date == check_in_date,
+        ServiceBooking.status.in_(ACTIVE_STATUSES)
+    )
+
+
+def duplicate_transport_booking(email, transport_id, since):
+    return ServiceBooking.query.filter(
+        ServiceBooking.customer_email == email,
+        ServiceBooking.transport_id == transport_id,
+        ServiceBooking.created_at >= since,
+        ServiceBooking.status.in_(ACTIVE_STATUSES)
+    )
+
+
+def duplicate_place_service_booking(email, place_id, check_in_date):
+    return ServiceBooking.query.filter(
+        ServiceBooking.customer_email == email,
+        ServiceBooking.place_id == place_id,
+        ServiceBooking.check_in_date == check_in_date,
+        ServiceBooking.status.in_(ACTIVE_STATUSES)
+    )
+
+
+def first_conflict(checks):
+    """Name of the first check in `checks` that matches any row, or None.
+
+    `checks` is an ordered list of (name, query). All of them run as a
+    single UNION ALL of EXISTS probes, so validating a booking costs one
+    round trip however many rules apply.
+    """
+    if not checks:
+        return None
+    probes = [
+        db.select(db.literal(name).label('rule')).where(query.exists())
+        for name, query in checks
+    ]
+    fired = set(db.session.execute(db.union_all(*probes)).scalars())
+    return next((name for name, _ in checks if name in fired), None)
+
+
+def idempotency_key():
+    """Token from the hidden form field, or None.
+
+    The form renders a fresh token each time, so a double-click or a
+    retried POST carries the same one and can be answered from the booking
+    it already created.
+    """
+    return request.form.get('idempotency_key', '').strip()[:64] or None
+
+
+def has_line_break(value):
+    # A CR or LF in an address would end up as an extra mail header
+    return '\r' in value or '\n' in value
+
+
+def replayed(model, key):
+    return model.query.filter_by(idempotency_key=key).first() if key else None
+
+
+def _find_by_id(model, place_id, item_id):
+    """`place_id`'s hotel or transport `item_id`, read fresh for price and capacity."""
+    try:
+        item = db.session.get(model, int(item_id))
+    except (TypeError, ValueError):
+        return None
+    return item if item and item.place_id == place_id else None
+
+
+# ------------ HOTEL AVAILABILITY ------------
+# Occupancy is stored per hotel per night, so "rooms free between two
+# dates" is an index range read on (hotel_id, night) instead of an overlap
+# scan over every booking the hotel ever had.
+
+def _nights(check_in_date, check_out_date):
+    night = check_in_date
+    while night < check_out_date:
+        yield night
+        night += timedelta(days=1)
+
+
+def holds_rooms(booking, status=None):
+    return bool(booking.hotel_id and booking.check_in_date and booking.check_out_date
+                and (status or booking.status) in ACTIVE_STATUSES)
+
+
+def _insert_ignore(model):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
+
+def adjust_occupancy(hotel_id, check_in_date, check_out_date, rooms, capacity=None):
+    """Add `rooms` (negative to release) to every night of a stay.
+
+    Done as one guarded UPDATE rather than read-modify-write, so two
+    concurrent bookings can't both see the last free room: with `capacity`
+    the UPDATE only touches nights that still have room, and the caller
+    must roll back when this returns False (some night was full).
+    """
+    nights = list(_nights(check_in_date, check_out_date))
+    db.session.execute(_insert_ignore(HotelNight), [
+        {'hotel_id': hotel_id, 'night': night, 'rooms_booked': 0} for night in nights
+    ])
+    booked = HotelNight.rooms_booked + rooms
+    stmt = db.update(HotelNight).where(
+        HotelNight.hotel_id == hotel_id,
+        HotelNight.night >= check_in_date,
+        HotelNight.night < check_out_date
+    ).values(rooms_booked=db.case((booked < 0, 0), else_=booked))
+    if capacity is not None:
+        stmt = stmt.where(HotelNight.rooms_booked <= capacity - rooms)
+    result = db.session.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount == len(nights)
+
+
+class NoRoomsLeft(Exception):
+    """Reactivating a booking would overbook one of its hotel nights."""
+
+
+def move_rooms(booking, new_status):
+    """Hold or release `booking`'s rooms for a change to `new_status`.
+
+    Re-holding is capacity-checked like a new booking; on NoRoomsLeft the
+    caller must roll back.
+    """
+    if holds_rooms(booking) == holds_rooms(booking, new_status):
+        return
+    if holds_rooms(booking):
+        adjust_occupancy(booking.hotel_id, booking.check_in_date, booking.check_out_date, -booking.num_rooms)
+    elif not adjust_occupancy(booking.hotel_id, booking.check_in_date, booking.check_out_date,
+                              booking.num_rooms, capacity=booking.hotel.total_rooms):
+        raise NoRoomsLeft(booking.id)
+
+
+def rooms_free(hotels, check_in_date, check_out_date):
+    """{hotel_id: rooms free on every night of the stay} in one query."""
+    booked = dict(db.session.query(
+        HotelNight.hotel_id, db.func.max(HotelNight.rooms_booked)
+    ).filter(
+        HotelNight.hotel_id.in_([hotel.id for hotel in hotels]),
+        HotelNight.night >= check_in_date,
+        HotelNight.night < check_out_date
+    ).group_by(HotelNight.hotel_id).all()) if hotels else {}
+    return {hotel.id: max(hotel.total_rooms - booked.get(hotel.id, 0), 0) for hotel in hotels}
+
+
+def rebuild_occupancy():
+    """Recompute hotel_night from the service bookings themselves."""
+    totals = {}
+    active = ServiceBooking.query.filter(
+        ServiceBooking.hotel_id.isnot(None),
+        ServiceBooking.check_in_date.isnot(None),
+        ServiceBooking.check_out_date.isnot(None),
+        ServiceBooking.status.in_(ACTIVE_STATUSES)
+    ).yield_per(1000)
+    for booking in active:
+        for night in _nights(booking.check_in_date, booking.check_out_date):
+            key = (booking.hotel_id, night)
+            totals[key] = totals.get(key, 0) + booking.num_rooms
+    HotelNight.query.delete()
+    db.session.bulk_insert_mappings(HotelNight, [
+        {'hotel_id': hotel_id, 'night': night, 'rooms_booked': rooms}
+        for (hotel_id, night), rooms in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+
+def _stay_from_args():
+    check_in_date = _parse_date(request.args.get('check_in'))
+    check_out_date = _parse_date(request.args.get('check_out'))
+    if check_in_date and check_out_date and check_in_date < check_out_date:
+        return check_in_date, check_out_date
+    return None, None
+
+
+# ------------ PACKAGE QUOTES ------------
+# Totals for every hotel x transport combination of a place at once, priced
+# the same way book_services prices a submitted booking.
+
+def quote_grid(hotel_prices, transport_prices, nights, people, rooms):
+    """[(hotel index, transport index, hotel total, transport total)], cheapest first.
+
+    Index 0 on either side means "none", so hotel-only and transport-only
+    packages are quoted too; (0, 0) is left out. Ties keep hotel then
+    transport order. Uses NumPy when installed, plain Python otherwise,
+    with the same results.
+    """
+    numpy = optional_module('numpy')
+    if numpy is not None:
+        hotel_totals = numpy.array([0.0] + hotel_prices) * nights * rooms
+        transport_totals = numpy.array([0.0] + transport_prices) * people
+        totals = numpy.add.outer(hotel_totals, transport_totals).ravel()[1:]
+        hotels, transports = numpy.divmod(numpy.argsort(totals, kind='stable') + 1, len(transport_totals))
+        return list(zip(hotels.tolist(), transports.tolist(),
+                        hotel_totals[hotels].tolist(), transport_totals[transports].tolist()))
+    hotel_totals = [price * nights * rooms for price in [0.0] + hotel_prices]
+    transport_totals = [price * people for price in [0.0] + transport_prices]
+    pairs = sorted((hotel_total + transport_total, i, j)
+                   for i, hotel_total in enumerate(hotel_totals)
+                   for j, transport_total in enumerate(transport_totals) if i or j)
+    return [(i, j, hotel_totals[i], transport_totals[j]) for _, i, j in pairs]
+
+
+def package_quotes(place, nights, people, rooms):
+    """Quote dicts for every package at `place`, from quote_cache."""
+    def loader():
+        hotels, transports = [None] + list(place.hotels), [None] + list(place.transports)
+        grid = quote_grid([hotel.price_per_night for hotel in hotels[1:]],
+                          [transport.price for transport in transports[1:]], nights, people, rooms)
+        return [{
+            'hotel_id': hotels[i].id if i else None,
+            'transport_id': transports[j].id if j else None,
+            'hotel_total': hotel_total,
+            'transport_total': transport_total,
+            'total': hotel_total + transport_total,
+        } for i, j, hotel_total, transport_total in grid]
+    return quote_cache.get((place.id, nights, people, rooms), loader)
+
+
+# ------------ DASHBOARD STATS ------------
+# Counters are kept at three scopes: the whole site, each place and each
+# day a booking was made. Per-state figures are summed from the place rows
+# using the cached catalog, so editing a place's state needs no rewrite.
+
+def bump_stats(changes):
+    """Apply [(scope, scope_key, metric, amount)] as atomic increments."""
+    totals = {}
+    for scope, scope_key, metric, amount in changes:
+        key = (scope, scope_key, metric)
+        totals[key] = totals.get(key, 0) + amount
+    rows = [
+        {'b_scope': scope, 'b_key': scope_key, 'b_metric': metric, 'b_amount': amount}
+        for (scope, scope_key, metric), amount in totals.items() if amount
+    ]
+    if not rows:
+        return
+    db.session.execute(_insert_ignore(DashboardStat), [
+        {'scope': row['b_scope'], 'scope_key': row['b_key'], 'metric': row['b_metric'], 'value': 0}
+        for row in rows
+    ])
+    table = DashboardStat.__table__
+    db.session.execute(
+        table.update().where(
+            table.c.scope == db.bindparam('b_scope'),
+            table.c.scope_key == db.bindparam('b_key'),
+            table.c.metric == db.bindparam('b_metric')
+        ).values(value=table.c.value + db.bindparam('b_amount')),
+        rows
+    )
+
+
+def booking_stats(kind, place_id, created_at, status, revenue, sign=1, new=False):
+    """Counter changes for a tour/service booking entering (sign=1) or
+    leaving (sign=-1) `status`; `new` also counts it in the totals."""
+    day = (created_at or datetime.utcnow()).date().isoformat()
+    changes = []
+    for scope, scope_key in [('all', ''), ('place', str(place_id)), ('day', day)]:
+        if new:
+            changes.append((scope, scope_key, f'{kind}_bookings', sign))
+        changes.append((scope, scope_key, f'{kind}_bookings_{status}', sign))
+        changes.append((scope, scope_key, f'{kind}_revenue_{status}', sign * (revenue or 0)))
+    return changes
+
+
+def status_change_stats(kind, booking, old_status, new_status, revenue):
+    return (booking_stats(kind, booking.place_id, booking.created_at, old_status, revenue, sign=-1)
+            + booking_stats(kind, booking.place_id, booking.created_at, new_status, revenue))
+
+
+def catalog_stats(metric, place_id, sign):
+    """Counter changes for adding (1) or removing (-1) a place/hotel/transport."""
+    changes = [('all', '', metric, sign)]
+    if metric != 'places':
+        changes.append(('place', str(place_id), metric, sign))
+    return changes
+
+
+def tour_revenue(booking):
+    place = cached_place(booking.place_id)
+    return (place.price_per_person if place else 0.0) * booking.num_people
+
+
+def rebuild_stats():
+    """Recount every dashboard counter from the source tables."""
+    totals = {}
+
+    def add(scope, scope_key, metric, amount):
+        key = (scope, str(scope_key), metric)
+        totals[key] = totals.get(key, 0) + (amount or 0)
+
+    add('all', '', 'places', Place.query.count())
+    for model, metric in [(Hotel, 'hotels'), (Transport, 'transports')]:
+        for place_id, count in db.session.query(model.place_id, db.func.count()).group_by(model.place_id):
+            add('all', '', metric, count)
+            add('place', place_id, metric, count)
+
+    # Archived bookings keep counting; archiving moves rows, it doesn't drop them
+    grouped = []
+    for model in ARCHIVES['tour']:
+        grouped.append(('tour', db.session.query(
+            model.place_id, db.func.date(model.created_at), model.status,
+            db.func.count(), db.func.sum(model.num_people * Place.price_per_person)
+        ).join(Place, Place.id == model.place_id).group_by(
+            model.place_id, db.func.date(model.created_at), model.status)))
+    for model in ARCHIVES['service']:
+        grouped.append(('service', db.session.query(
+            model.place_id, db.func.date(model.created_at), model.status,
+            db.func.count(), db.func.sum(model.total_amount)
+        ).group_by(model.place_id, db.func.date(model.created_at), model.status)))
+
+    for kind, rows in grouped:
+        for place_id, day, status, count, revenue in rows:
+            for scope, scope_key in [('all', ''), ('place', place_id), ('day', day or '')]:
+                add(scope, scope_key, f'{kind}_bookings', count)
+                add(scope, scope_key, f'{kind}_bookings_{status}', count)
+                add(scope, scope_key, f'{kind}_revenue_{status}', revenue)
+
+    DashboardStat.query.delete()
+    db.session.bulk_insert_mappings(DashboardStat, [
+        {'scope': scope, 'scope_key': scope_key, 'metric': metric, 'value': value}
+        for (scope, scope_key, metric), value in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+
+def start_stats_reconciler(app):
+    """Rebuild `app`'s counters every STATS_RECONCILE_INTERVAL seconds in a
+    daemon thread, correcting any drift (e.g. price edits after booking)."""
+    interval = app.config['STATS_RECONCILE_INTERVAL']
+    if not interval:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    rebuild_stats()
+                except Exception:
+                    app.logger.exception("Dashboard stats reconciliation failed")
+
+    thread = threading.Thread(target=run, name='stats-reconciler', daemon=True)
+    thread.start()
+    return thread
+
+
+def dashboard_stats():
+    """Totals plus per-state, per-place and per-day breakdowns."""
+    since = (datetime.utcnow().date() - timedelta(days=current_app.config['STATS_DAYS'] - 1)).isoformat()
+    rows = DashboardStat.query.filter(db.or_(
+        DashboardStat.scope.in_(['all', 'place']),
+        db.and_(DashboardStat.scope == 'day', DashboardStat.scope_key >= since)
+    )).all()
+
+    totals, per_place, per_day = {}, {}, {}
+    for row in rows:
+        target = {'all': totals, 'place': per_place, 'day': per_day}[row.scope]
+        bucket = target if row.scope == 'all' else target.setdefault(row.scope_key, {})
+        bucket[row.metric] = row.value
+
+    places = {str(place.id): place for place in cached_catalog()}
+    per_state = {}
+    for place_id, metrics in per_place.items():
+        place = places.get(place_id)
+        if place is None:
+            continue
+        state = per_state.setdefault(place.state, {})
+        for metric, value in metrics.items():
+            state[metric] = state.get(metric, 0) + value
+
+    return {
+        'totals': totals,
+        'per_state': sorted(per_state.items()),
+        'per_place': sorted(
+            ((places[place_id], metrics) for place_id, metrics in per_place.items() if place_id in places),
+            key=lambda item: -item[1].get('tour_bookings', 0) - item[1].get('service_bookings', 0)
+        ),
+        'per_day': sorted(per_day.items(), reverse=True),
+    }
+
+
+# ------------ NOTIFICATION OUTBOX ------------
+# Requests only add Notification rows to their own transaction, so a
+# customer is told about exactly the bookings and status changes that were
+# committed, and a slow or unreachable mail server never delays a page.
+# Delivery threads (start_notification_workers, `flask notify-worker`)
+# claim due rows in batches under a lease, send them and retry failures
+# with exponential backoff. Delivery is at least once: a worker that dies
+# after sending but before committing leaves the batch to be resent when
+# its lease runs out.
+
+NOTIFICATION_TEXTS = {
+    'created': ("We received your booking request {ref}",
+                "Hi {name},\n\nThank you for booking {what}{when}. Your request {ref} is pending; "
+                "we will contact you shortly to confirm it.\n\nCultural Tours"),
+    'status': ("Your booking {ref} is now {status}",
+               "Hi {name},\n\nYour booking {ref} for {what}{when} is now {status}.\n\nCultural Tours"),
+}
+SMS_TEXT = "Cultural Tours: booking {ref} for {what}{when} is {status}."
+
+# Woken after a commit that queued notifications, so in-process workers
+# don't wait out their poll interval
+_outbox_wakeup = threading.Event()
+
+
+def _booking_contact(kind, booking):
+    if kind == 'tour':
+        return booking.name, booking.email, booking.phone, booking.travel_date
+    return booking.customer_name, booking.customer_email, booking.customer_phone, booking.check_in_date
+
+
+def queue_notifications(kind, booking, new_status=None):
+    """Add the customer's email (and SMS) about `booking` to the session.
+
+    Without `new_status` the booking was just created. Nothing is sent
+    here; the rows commit or roll back with the caller's transaction.
+    """
+    if booking.id is None:
+        db.session.flush()
+    name, email, phone, day = _booking_contact(kind, booking)
+    place = cached_place(booking.place_id)
+    event_name = 'status' if new_status else 'created'
+    values = {
+        'ref': f"{kind[0].upper()}{booking.id}",
+        'name': name or 'there',
+        'what': place.name if place else 'your trip',
+        'when': f" on {day.strftime('%d %b %Y')}" if day else '',
+        'status': (new_status or booking.status or 'Pending').lower(),
+    }
+    subject, body = NOTIFICATION_TEXTS[event_name]
+    messages = []
+    if email:
+        messages.append(('email', email, subject.format(**values), body.format(**values)))
+    if phone and current_app.config['SMS_GATEWAY_URL']:
+        messages.append(('sms', phone, None, SMS_TEXT.format(**values)))
+    db.session.add_all([
+        Notification(booking_kind=kind, booking_id=booking.id, event=event_name, channel=channel,
+                     recipient=recipient[:120], subject=subject, body=body)
+        for channel, recipient, subject, body in messages
+    ])
+    db.session.info['notifications_queued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_notification_workers(session):
+    if session.info.pop('notifications_queued', False):
+        _outbox_wakeup.set()
+
+
+def claim_notifications(limit, lease):
+    """Take up to `limit` due notifications for `lease` seconds.
+
+    The guarded UPDATE re-checks that each row is still due, so two
+    workers (threads or processes) racing for the same rows never both get
+    one; rows a crashed worker held come due again when the lease ends.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = db.select(Notification.id).where(
+        Notification.status == 'pending', Notification.next_attempt_at <= now
+    ).order_by(Notification.next_attempt_at, Notification.id).limit(limit)
+    db.session.execute(
+        db.update(Notification).where(
+            Notification.id.in_(due.scalar_subquery()),
+            Notification.status == 'pending',
+            Notification.next_attempt_at <= now
+        ).values(claimed_by=token, next_attempt_at=now + timedelta(seconds=lease)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return Notification.query.filter_by(claimed_by=token).order_by(Notification.id).all()
+
+
+def send_emails(notifications):
+    """Send over one SMTP connection; {id: error text, or None if sent}."""
+    import smtplib
+    from email.message import EmailMessage
+
+    config = current_app.config
+    results = {}
+    try:
+        with smtplib.SMTP(config['SMTP_HOST'], config['SMTP_PORT'], timeout=config['NOTIFY_TIMEOUT']) as smtp:
+            if config['SMTP_STARTTLS']:
+                smtp.starttls()
+            if config['SMTP_USERNAME']:
+                smtp.login(config['SMTP_USERNAME'], config['SMTP_PASSWORD'])
+            for notification in notifications:
+                try:
+                    message = EmailMessage()
+                    message['From'] = config['NOTIFY_FROM']
+                    message['To'] = notification.recipient
+                    message['Subject'] = notification.subject
+                    message.set_content(notification.body)
+                    smtp.send_message(message)
+                    results[notification.id] = None
+                except (ValueError, smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as error:
+                    # This message couldn't be built or was refused; the
+                    # connection is still usable for the rest of the batch
+                    results[notification.id] = f"{type(error).__name__}: {error}"
+    except (OSError, smtplib.SMTPException) as error:
+        for notification in notifications:
+            results.setdefault(notification.id, f"{type(error).__name__}: {error}")
+    return results
+
+
+def send_sms(notifications):
+    """POST each message to SMS_GATEWAY_URL; {id: error text, or None if sent}."""
+    import http.client
+    import urllib.request
+
+    config = current_app.config
+    results = {}
+    for notification in notifications:
+        try:
+            call = urllib.request.Request(
+                config['SMS_GATEWAY_URL'], method='POST', headers={'Content-Type': 'application/json'},
+                data=json.dumps({'to': notification.recipient, 'text': notification.body}).encode())
+            urllib.request.urlopen(call, timeout=config['NOTIFY_TIMEOUT']).close()
+            results[notification.id] = None
+        except (OSError, ValueError, http.client.HTTPException) as error:
+            results[notification.id] = f"{type(error).__name__}: {error}"
+    return results
+
+
+NOTIFICATION_SENDERS = {'email': send_emails, 'sms': send_sms}
+
+
+def retry_delay(attempts):
+    """Seconds before retry number `attempts`: doubling, capped, +-20% jitter
+    so a batch that failed together doesn't retry together."""
+    config = current_app.config
+    delay = min(config['NOTIFY_RETRY_BASE'] * 2 ** (attempts - 1), config['NOTIFY_RETRY_MAX'])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def deliver_notifications():
+    """Claim one batch, send it and record the outcome; returns {outcome: count}."""
+    config = current_app.config
+    batch = claim_notifications(config['NOTIFY_BATCH_SIZE'], config['NOTIFY_LEASE'])
+    outcome = {'sent': 0, 'retry': 0, 'failed': 0}
+    if not batch:
+        return outcome
+    results = {}
+    for channel, sender in NOTIFICATION_SENDERS.items():
+        notifications = [notification for notification in batch if notification.channel == channel]
+        if notifications:
+            results.update(sender(notifications))
+
+    now = datetime.utcnow()
+    last_error = None
+    for notification in batch:
+        error = results.get(notification.id, f"no sender for channel {notification.channel!r}")
+        notification.attempts += 1
+        notification.claimed_by = None
+        notification.last_error = error[:500] if error else None
+        last_error = error or last_error
+        if error is None:
+            notification.status, notification.sent_at = 'sent', now
+            outcome['sent'] += 1
+        elif notification.attempts >= config['NOTIFY_MAX_ATTEMPTS']:
+            notification.status = 'failed'
+            outcome['failed'] += 1
+        else:
+            notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+            outcome['retry'] += 1
+    db.session.commit()
+    if outcome['retry'] or outcome['failed']:
+        current_app.logger.warning("Notifications: %d sent, %d to retry, %d failed for good; last error: %s",
+                                   outcome['sent'], outcome['retry'], outcome['failed'], last_error)
+    return outcome
+
+
+def start_notification_workers(app, count=None, stop=None):
+    """Deliver `app`'s outbox from `count` (NOTIFY_WORKERS) daemon threads
+    until `stop` is set. Workers in several processes can run at once."""
+    count = app.config['NOTIFY_WORKERS'] if count is None else count
+    stop = stop or threading.Event()
+
+    def run():
+        while not stop.is_set():
+            with app.app_context():
+                try:
+                    busy = sum(deliver_notifications().values())
+                except Exception:
+                    app.logger.exception("Notification delivery failed")
+                    busy = 0
+            if not busy:
+                # Idle: sleep until the poll interval ends or a commit queues more
+                _outbox_wakeup.wait(app.config['NOTIFY_POLL_INTERVAL'])
+                _outbox_wakeup.clear()
+
+    threads = [threading.Thread(target=run, name=f'notify-{number}', daemon=True) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def outbox_stats():
+    return dict(db.session.query(Notification.status, db.func.count()).group_by(Notification.status).all())
+
+
+# ------------ BOOKING ARCHIVE ------------
+# Finished trips are moved, in batches of ARCHIVE_BATCH_SIZE, from the live
+# booking tables into their archive tables. Each batch copies and deletes
+# the same ids in one transaction, so the job can be stopped at any point
+# and simply run again; the conflict checks, availability and listings
+# only ever see the live rows.
+
+ARCHIVES = {
+    'tour': (Booking, BookingArchive),
+    'service': (ServiceBooking, ServiceBookingArchive),
+}
+
+
+def archive_due(kind, cutoff):
+    """WHERE clause for live bookings of `kind` whose trip ended before `cutoff`.
+
+    Service bookings without a check-out date go by the day they were made.
+    Tour bookings a live service booking still points at stay put.
+    """
+    if kind == 'tour':
+        referenced = db.select(ServiceBooking.main_booking_id).where(ServiceBooking.main_booking_id.isnot(None))
+        return db.and_(Booking.travel_date < cutoff, Booking.id.notin_(referenced))
+    return db.or_(
+        ServiceBooking.check_out_date < cutoff,
+        db.and_(ServiceBooking.check_out_date.is_(None),
+                ServiceBooking.created_at < datetime.combine(cutoff, datetime.min.time()))
+    )
+
+
+def archive_batch(kind, cutoff, batch_size):
+    """Move up to `batch_size` due bookings of `kind`; returns how many moved."""
+    model, archive = ARCHIVES[kind]
+    ids = db.session.scalars(db.select(model.id).where(archive_due(kind, cutoff)).limit(batch_size)).all()
+    if not ids:
+        return 0
+    columns = list(model.__table__.columns)
+    db.session.execute(db.insert(archive).from_select(
+        [column.name for column in columns] + ['archived_at'],
+        db.select(*columns, db.literal(datetime.utcnow(), db.DateTime)).where(model.id.in_(ids))
+    ))
+    db.session.execute(db.delete(model).where(model.id.in_(ids)), execution_options={'synchronize_session': False})
+    db.session.commit()
+    return len(ids)
+
+
+def archive_bookings(cutoff, batch_size=None):
+    """Archive every booking whose trip ended before `cutoff`.
+
+    Service bookings go first, since they may reference tour bookings.
+    Hotel occupancy nights before `cutoff` are dropped too; nothing reads
+    them and rebuild_occupancy() would not recreate them.
+    Returns {'tour': moved, 'service': moved, 'hotel_nights': dropped}.
+    """
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    moved = {}
+    for kind in ('service', 'tour'):
+        moved[kind] = 0
+        while count := archive_batch(kind, cutoff, batch_size):
+            moved[kind] += count
+    moved['hotel_nights'] = HotelNight.query.filter(HotelNight.night < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return moved
+
+
+def listing_model(kind, filters):
+    """The live or the archive model of `kind`, as ?archived=1 asks."""
+    live, archive = ARCHIVES[kind]
+    return archive if filters.get('archived') else live
+
+
 # ------------ PUBLIC ROUTES ------------
 def to_youtube_embed(url: str) -> str:
     if not url:
@@ -143,37 +2096,55 @@ def to_youtube_embed(url: str) -> str:
     # already an embed or something else
     return url
 
-@app.template_filter('youtube_embed')
+@public_bp.app_template_filter('youtube_embed')
 def youtube_embed(url):
     return to_youtube_embed(url)
-@app.route('/')
+
+@public_bp.route('/')
+@conditional_page(lambda: catalog_last_modified(request.args.get('state')))
+@cached_page(index_cache_key)
 def index():
     state_filter = request.args.get('state')
-    query = Place.query
-    if state_filter:
-        query = query.filter_by(state=state_filter)
-    places = query.order_by(Place.created_at.desc()).all()
-
-    # Preload related data
-    for place in places:
-        place.hotels = Hotel.query.filter_by(place_id=place.id).all()
-        place.transports = Transport.query.filter_by(place_id=place.id).all()
+    query = request.args.get('q', '').strip()
+    selected = selected_facets(request.args)
+    facets = facet_index(state_filter)
+    snippets = {}
+    if search_terms(query):
+        results = search_places(query, state_filter)
+        snippets = {place.id: snippet for place, snippet in results if snippet}
+        matched, facet_counts = facets.select(selected, within=facets.mask_of(p.id for p, _ in results))
+        # Keep search ranking rather than catalog order
+        keep = {place.id for place in matched}
+        places = [place for place, _ in results if place.id in keep]
+    else:
+        places, facet_counts = facets.select(selected)
 
     states = ["Karnataka", "Tamil Nadu", "Andhra Pradesh", "Maharashtra"]
-    return render_template('index.html', places=places, states=states, selected_state=state_filter)
+    return render_template('index.html', places=places, states=states, selected_state=state_filter,
+                           query=query, snippets=snippets, facets=FACETS, facet_counts=facet_counts,
+                           selected_facets=selected)
 
 
-@app.route('/place/<int:place_id>')
+@public_bp.route('/place/<int:place_id>')
+@conditional_page(place_last_modified)
+@cached_page(lambda place_id: ('place_detail', place_id))
 def place_detail(place_id):
-    place = Place.query.get_or_404(place_id)
+    place = get_place_or_404(place_id)
     return render_template('place_detail.html', place=place)
 
 
-@app.route('/book/<int:place_id>', methods=['GET', 'POST'])
+@public_bp.route('/book/<int:place_id>', methods=['GET', 'POST'])
+@rate_limited(('booking_ip', client_ip), ('booking_email', form_field('email')))
 def book_place(place_id):
-    place = Place.query.get_or_404(place_id)
+    place = get_place_or_404(place_id)
 
     if request.method == 'POST':
+        key = idempotency_key()
+        existing = replayed(Booking, key)
+        if existing:
+            flash("Your booking request has been submitted!", "success")
+            return redirect(url_for('public.booking_success', booking_id=existing.id))
+
         name = request.form.get('name', '').strip()
         email = request.form.get('email', '').strip()
         phone = request.form.get('phone', '').strip()
@@ -183,18 +2154,22 @@ def book_place(place_id):
 
         if not (name and email and phone and travel_date_str):
             flash("All required fields must be filled.", "danger")
-            return redirect(url_for('book_place', place_id=place.id))
+            return redirect(url_for('public.book_place', place_id=place.id))
+
+        if has_line_break(email):
+            flash("Please enter a valid email address.", "danger")
+            return redirect(url_for('public.book_place', place_id=place.id))
 
         try:
             travel_date = datetime.strptime(travel_date_str, '%Y-%m-%d').date()
         except ValueError:
             flash("Invalid travel date.", "danger")
-            return redirect(url_for('book_place', place_id=place.id))
+            return redirect(url_for('public.book_place', place_id=place.id))
 
         # Check if travel date is in the past
         if travel_date < datetime.now().date():
             flash("Travel date cannot be in the past.", "danger")
-            return redirect(url_for('book_place', place_id=place.id))
+            return redirect(url_for('public.book_place', place_id=place.id))
 
         try:
             num_people = int(num_people)
@@ -202,18 +2177,18 @@ def book_place(place_id):
                 raise ValueError
         except ValueError:
             flash("Number of people must be a positive number.", "danger")
-            return redirect(url_for('book_place', place_id=place.id))
+            return redirect(url_for('public.book_place', place_id=place.id))
 
         # Check if user already has a booking on the same date
-        existing_booking = Booking.query.filter(
-            Booking.email == email,
-            Booking.travel_date == travel_date,
-            Booking.status.in_(['Pending', 'Confirmed'])
-        ).first()
+        existing_booking = duplicate_tour_booking(email, travel_date).first()
 
         if existing_booking:
+            if key and existing_booking.idempotency_key == key:
+                # This same form, committed by a replay since the lookup above
+                flash("Your booking request has been submitted!", "success")
+                return redirect(url_for('public.booking_success', booking_id=existing_booking.id))
             flash(f"You already have a booking on {travel_date_str}. Please choose a different date or contact us to modify your existing booking.", "danger")
-            return redirect(url_for('book_place', place_id=place.id))
+            return redirect(url_for('public.book_place', place_id=place.id))
 
         booking = Booking(
             place_id=place.id,
@@ -222,24 +2197,587 @@ def book_place(place_id):
             phone=phone,
             travel_date=travel_date,
             num_people=num_people,
-            special_requests=special_requests
+            special_requests=special_requests,
+            idempotency_key=key
         )
         db.session.add(booking)
-        db.session.commit()
+        try:
+            # bump_stats() autoflushes the booking, so it can be the
+            # statement that hits the unique indexes
+            bump_stats(booking_stats('tour', place.id, None, 'Pending',
+                                     place.price_per_person * num_people, new=True))
+            queue_notifications('tour', booking)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submit for the same email and date (or a replay
+            # of this very form) won the race
+            db.session.rollback()
+            existing = replayed(Booking, key)
+            if existing:
+                flash("Your booking request has been submitted!", "success")
+                return redirect(url_for('public.booking_success', booking_id=existing.id))
+            flash(f"You already have a booking on {travel_date_str}. Please choose a different date or contact us to modify your existing booking.", "danger")
+            return redirect(url_for('public.book_place', place_id=place.id))
         flash("Your booking request has been submitted!", "success")
-        return redirect(url_for('booking_success', booking_id=booking.id))
+        return redirect(url_for('public.booking_success', booking_id=booking.id))
 
-    return render_template('booking_form.html', place=place)
+    return render_template('booking_form.html', place=place, idempotency_key=uuid.uuid4().hex)
 
-@app.route('/booking-success/<int:booking_id>')
+@public_bp.route('/booking-success/<int:booking_id>')
 def booking_success(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     return render_template('booking_success.html', booking=booking)
 
 
+# ------------ ADMIN LISTINGS ------------
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def admin_filters():
+    """Status / place / date filters from the query string.
+
+    Values that don't parse are dropped rather than rejected, so a bad link
+    just shows the unfiltered listing.
+    """
+    try:
+        place_id = int(request.args.get('place_id', ''))
+    except ValueError:
+        place_id = None
+    return {
+        'status': request.args.get('status') or None,
+        'place_id': place_id,
+        'date_from': _parse_date(request.args.get('date_from')),
+        'date_to': _parse_date(request.args.get('date_to')),
+        'archived': request.args.get('archived') == '1',
+    }
+
+
+def apply_filters(query, model, filters, date_column=None):
+    if filters['status'] and hasattr(model, 'status'):
+        query = query.filter(model.status == filters['status'])
+    if filters['place_id']:
+        query = query.filter(model.place_id == filters['place_id'])
+    if date_column is not None:
+        if filters['date_from']:
+            query = query.filter(date_column >= filters['date_from'])
+        if filters['date_to']:
+            query = query.filter(date_column <= filters['date_to'])
+    return query
+
+
+def _encode_cursor(row):
+    return f"{row.created_at.isoformat()}_{row.id}"
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(query, model):
+    """One page of `query`, newest first, continuing after ?cursor=.
+
+    Seeks on (created_at, id) instead of using OFFSET, so every page costs
+    the same however deep into the listing it is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    page_size = current_app.config['ADMIN_PAGE_SIZE']
+    position = _decode_cursor(request.args.get('cursor'))
+    if position:
+        created_at, row_id = position
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < row_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(page_size + 1).all()
+    next_cursor = _encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+@admin_bp.app_template_global()
+def listing_args(filters):
+    """Filter values as query-string arguments for pager links."""
+    return {
+        key: value.isoformat() if hasattr(value, 'isoformat') else 1 if value is True else value
+        for key, value in filters.items() if value
+    }
+
+
+# ------------ BULK STATUS UPDATES ------------
+
+MAX_BULK_IDS = 500
+
+
+def bulk_status_response(model, statuses, changes):
+    """JSON endpoint body: move {"ids": [...]} to {"status": ...} in one UPDATE.
+
+    `changes(booking, new_status)` returns the dashboard counter changes for
+    one booking and does any other bookkeeping (occupancy, notifications)
+    in the same transaction; it raises NoRoomsLeft to refuse the batch. Each row is only updated if its status is still the one
+    read here, so a concurrent edit makes the whole batch fail with 409
+    instead of double-counting.
+    """
+    data = request.get_json(silent=True) or {}
+    ids, new_status = data.get('ids'), data.get('status')
+    if new_status not in statuses:
+        return jsonify(error="Invalid status."), 400
+    if (not isinstance(ids, list) or not 0 < len(ids) <= MAX_BULK_IDS
+            or not all(isinstance(booking_id, int) for booking_id in ids)):
+        return jsonify(error=f"ids must be a list of 1 to {MAX_BULK_IDS} booking ids."), 400
+
+    bookings = model.query.filter(model.id.in_(ids)).all()
+    changed = [booking for booking in bookings if booking.status != new_status]
+    body = {
+        'status': new_status,
+        'updated': sorted(booking.id for booking in changed),
+        'unchanged': sorted(booking.id for booking in bookings if booking.status == new_status),
+        'not_found': sorted(set(ids) - {booking.id for booking in bookings}),
+    }
+    stat_changes = []
+    try:
+        for booking in changed:
+            stat_changes += changes(booking, new_status)
+    except NoRoomsLeft as exc:
+        db.session.rollback()
+        return jsonify(error=f"Booking #{exc.args[0]} can't be reactivated: its hotel is full on some of those nights."), 409
+    if changed:
+        try:
+            result = db.session.execute(
+                db.update(model).where(
+                    model.id.in_(body['updated']),
+                    model.status == db.case({b.id: b.status for b in changed}, value=model.id)
+                ).values(status=new_status),
+                execution_options={'synchronize_session': False}
+            )
+            if result.rowcount != len(changed):
+                db.session.rollback()
+                return jsonify(error="Some bookings changed meanwhile, reload and retry."), 409
+            bump_stats(stat_changes)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify(error="That would clash with another active booking for the same customer and date."), 409
+    return jsonify(body)
+
+
+# ------------ BOOKING EXPORTS ------------
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def export_query(kind, filters):
+    """Flat rows of bookings (archived ones with `archived`) with their
+    place/hotel/transport names."""
+    model = listing_model(kind, filters)
+    if kind == 'tour':
+        stmt = db.select(
+            model.id, Place.name.label('place'), Place.state, model.name, model.email,
+            model.phone, model.travel_date, model.num_people, model.status,
+            model.special_requests, model.created_at
+        ).join(Place, Place.id == model.place_id)
+        stmt = apply_filters(stmt, model, filters, model.travel_date)
+        return stmt.order_by(model.created_at, model.id)
+
+    stmt = db.select(
+        model.id, Place.name.label('place'), Place.state, model.customer_name,
+        model.customer_email, model.customer_phone, Hotel.name.label('hotel'),
+        Transport.name.label('transport'), Transport.transport_type, model.check_in_date,
+        model.check_out_date, model.num_people, model.num_rooms,
+        model.num_days, model.hotel_total, model.transport_total,
+        model.total_amount, model.status, model.special_requests,
+        model.created_at
+    ).join(Place, Place.id == model.place_id).outerjoin(
+        Hotel, Hotel.id == model.hotel_id
+    ).outerjoin(Transport, Transport.id == model.transport_id)
+    stmt = apply_filters(stmt, model, filters, model.check_in_date)
+    return stmt.order_by(model.created_at, model.id)
+
+
+def export_chunks(kind, filters, fmt):
+    """Yield the export as text chunks of EXPORT_CHUNK_SIZE rows.
+
+    Rows are pulled through a streaming cursor and written out chunk by
+    chunk, so memory stays flat however many bookings match.
+    """
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    result = db.session.execute(
+        export_query(kind, filters).execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    columns = list(result.keys())
+    header_pending = fmt == 'csv'
+    for partition in result.partitions():
+        buffer = io.StringIO()
+        if fmt == 'csv':
+            writer = csv.writer(buffer)
+            if header_pending:
+                writer.writerow(columns)
+                header_pending = False
+            writer.writerows(partition)
+        else:
+            for row in partition:
+                buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+                buffer.write('\n')
+        yield buffer.getvalue()
+    if header_pending:
+        # Nothing matched; still send the header so the file is valid CSV
+        yield ','.join(columns) + '\r\n'
+
+
+def export_response(kind, fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    filters = admin_filters()
+    filename = f"{'bookings' if kind == 'tour' else 'service_bookings'}{'_archive' if filters['archived'] else ''}.{fmt}"
+    return Response(
+        stream_with_context(export_chunks(kind, filters, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+# ------------ CATALOG FORMS ------------
+# Shared by the admin add/edit handlers and import-catalog, so a row from a
+# file is held to the same rules as one typed into the form.
+
+
+def _text(data, key):
+    value = data.get(key)
+    return str(value).strip() if value is not None else ''
+
+
+def _number(value, convert, default):
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_place_form(data):
+    """Place column values from a form or import row, as (values, error)."""
+    values = {key: _text(data, key) for key in (
+        'name', 'state', 'city', 'short_intro', 'description', 'culture_description',
+        'image_url', 'video_url')}
+    if not (values['name'] and values['state'] and values['short_intro']
+            and values['description'] and values['culture_description']):
+        return None, "Please fill all required fields."
+    values['image_url'] = values['image_url'] or None
+    values['video_url'] = values['video_url'] or None
+    values['price_per_person'] = _number(data.get('price_per_person', '0'), float, 0.0)
+    values['duration_days'] = _number(data.get('duration_days', '1'), int, 1)
+    return values, None
+
+
+def parse_hotel_form(data):
+    """Hotel column values from a form or import row, as (values, error)."""
+    values = {key: _text(data, key) or None for key in (
+        'name', 'description', 'amenities', 'image_url', 'contact_info')}
+    values['place_id'] = _number(data.get('place_id'), int, None)
+    if not (values['place_id'] and values['name']):
+        return None, "Place and name are required."
+    values['price_per_night'] = _number(data.get('price_per_night', '0'), float, 0.0)
+    values['rating'] = _number(data.get('rating') or None, float, None)
+    values['total_rooms'] = max(_number(data.get('total_rooms', '10'), int, 10), 1)
+    return values, None
+
+
+def parse_transport_form(data):
+    """Transport column values from a form or import row, as (values, error)."""
+    values = {key: _text(data, key) or None for key in (
+        'transport_type', 'name', 'description', 'operating_hours', 'contact_info')}
+    values['place_id'] = _number(data.get('place_id'), int, None)
+    if not (values['place_id'] and values['transport_type'] and values['name']):
+        return None, "Place, transport type and name are required."
+    if values['transport_type'] not in TRANSPORT_TYPES:
+        return None, f"Transport type must be one of {', '.join(TRANSPORT_TYPES)}."
+    values['price'] = _number(data.get('price', '0'), float, 0.0)
+    values['capacity'] = _number(data.get('capacity') or None, int, None)
+    values['duration_hours'] = _number(data.get('duration_hours') or None, float, None)
+    return values, None
+
+
+# ------------ CATALOG IMPORT / EXPORT ------------
+# Hotels and transports refer to their place by name (plus place_state when
+# two places share a name), so an export re-imports into another database.
+# Rows matching an existing one on CATALOG_KEYS update it instead, so
+# importing the same export twice changes nothing.
+
+CATALOG_COLUMNS = {
+    'places': ['name', 'state', 'city', 'short_intro', 'description', 'culture_description',
+               'image_url', 'video_url', 'price_per_person', 'duration_days'],
+    'hotels': ['place', 'place_state', 'name', 'description', 'price_per_night', 'rating',
+               'total_rooms', 'amenities', 'image_url', 'contact_info'],
+    'transports': ['place', 'place_state', 'transport_type', 'name', 'description', 'price',
+                   'capacity', 'duration_hours', 'operating_hours', 'contact_info'],
+}
+CATALOG_MODELS = {'places': Place, 'hotels': Hotel, 'transports': Transport}
+CATALOG_PARSERS = {'places': parse_place_form, 'hotels': parse_hotel_form,
+                   'transports': parse_transport_form}
+CATALOG_KEYS = {
+    'places': ('name', 'state'),
+    'hotels': ('place_id', 'name'),
+    'transports': ('place_id', 'transport_type', 'name'),
+}
+
+
+def _catalog_key(kind, values):
+    return tuple(value.casefold() if isinstance(value, str) else value
+                 for value in (values[column] for column in CATALOG_KEYS[kind]))
+
+
+def _existing_ids(kind):
+    """{CATALOG_KEYS value: id} of the rows already in the database."""
+    model = CATALOG_MODELS[kind]
+    columns = CATALOG_KEYS[kind]
+    stmt = db.select(model.id, *[getattr(model, column) for column in columns])
+    return {_catalog_key(kind, dict(zip(columns, key))): row_id
+            for row_id, *key in db.session.execute(stmt)}
+
+
+def _place_index():
+    index = {}
+    for place_id, name, state in db.session.execute(db.select(Place.id, Place.name, Place.state)):
+        index.setdefault(name.casefold(), []).append((state.casefold(), place_id))
+    return index
+
+
+def _resolve_place(index, name, state):
+    candidates = index.get(name.casefold(), [])
+    if state:
+        candidates = [c for c in candidates if c[0] == state.casefold()]
+    if not candidates:
+        return None, f"unknown place '{name}'"
+    if len(candidates) > 1:
+        return None, f"place '{name}' is ambiguous, add a place_state column"
+    return candidates[0][1], None
+
+
+def import_catalog(sources, batch_size=500):
+    """Insert or update {kind: [row dicts]} of places, hotels and transports.
+
+    Rows are validated with the admin form parsers and written as batched
+    executemany INSERTs, or UPDATEs by id for rows matching an existing one
+    on CATALOG_KEYS, in the session's transaction; places go first so
+    hotels and transports in the same import can refer to them. The search
+    index is updated for every written place and place with written hotels.
+    Returns ({kind: rows written}, [errors]); the caller commits only if
+    there are no errors.
+    """
+    counts, errors = {}, []
+    index = None
+    reindex = set()
+    for kind in CATALOG_COLUMNS:
+        parsed = []
+        for number, row in enumerate(sources.get(kind) or [], start=1):
+            if kind != 'places':
+                if index is None:
+                    index = _place_index()
+                place_id, error = _resolve_place(index, _text(row, 'place'), _text(row, 'place_state'))
+                if error:
+                    errors.append(f"{kind} row {number}: {error}")
+                    continue
+                row = dict(row, place_id=place_id)
+            values, error = CATALOG_PARSERS[kind](row)
+            if error:
+                errors.append(f"{kind} row {number}: {error}")
+                continue
+            parsed.append(values)
+
+        # A later row with the same key wins, within the file as over the database
+        existing = _existing_ids(kind) if parsed else {}
+        added, updated = {}, {}
+        for values in parsed:
+            key = _catalog_key(kind, values)
+            if key in existing:
+                updated[key] = dict(values, id=existing[key])
+            else:
+                added[key] = values
+        rows, changed = list(added.values()), list(updated.values())
+
+        model = CATALOG_MODELS[kind]
+        for start in range(0, len(rows), batch_size):
+            stmt = db.insert(model)
+            if kind == 'places':
+                reindex.update(db.session.scalars(stmt.returning(Place.id), rows[start:start + batch_size]))
+            else:
+                db.session.execute(stmt, rows[start:start + batch_size])
+        for start in range(0, len(changed), batch_size):
+            db.session.execute(db.update(model), changed[start:start + batch_size])
+        if kind == 'places':
+            reindex.update(values['id'] for values in changed)
+        elif kind == 'hotels':
+            reindex.update(values['place_id'] for values in rows + changed)
+        bump_stats([change for values in rows
+                    for change in catalog_stats(kind, values.get('place_id'), 1)])
+        counts[kind] = len(rows) + len(changed)
+    update_search_index(reindex)
+    return counts, errors
+
+
+def export_catalog(kind):
+    """Rows of one catalog kind in the CATALOG_COLUMNS layout."""
+    if kind == 'places':
+        stmt = db.select(*[getattr(Place, name) for name in CATALOG_COLUMNS[kind]]).order_by(Place.id)
+    else:
+        model = CATALOG_MODELS[kind]
+        stmt = db.select(
+            Place.name.label('place'), Place.state.label('place_state'),
+            *[getattr(model, name) for name in CATALOG_COLUMNS[kind][2:]]
+        ).join(Place, Place.id == model.place_id).order_by(model.id)
+    return [dict(row) for row in db.session.execute(stmt).mappings()]
+
+
+# ------------ CATALOG API ------------
+# Read-only JSON for the mobile app and partner sites. Only the requested
+# columns are selected (?fields=name,state), pages seek on id, and each
+# serialized body is kept in page_cache under its normalized arguments, so
+# it is dropped by the same catalog_changed() as the HTML pages and shares
+# their ETag.
+
+API_FIELDS = {
+    'places': ['id'] + CATALOG_COLUMNS['places'] + ['created_at'],
+    'hotels': ['id', 'place_id'] + CATALOG_COLUMNS['hotels'][2:] + ['created_at'],
+    'transports': ['id', 'place_id'] + CATALOG_COLUMNS['transports'][2:] + ['created_at'],
+}
+API_INCLUDES = {'places': ['hotels', 'transports']}
+# ?name= filters per kind: (column, converter)
+API_FILTERS = {
+    'places': {'state': (Place.state, str)},
+    'hotels': {'place_id': (Hotel.place_id, int)},
+    'transports': {'place_id': (Transport.place_id, int), 'type': (Transport.transport_type, str)},
+}
+
+
+def api_error(message, status=400):
+    abort(make_response(jsonify(error=message), status))
+
+
+def _api_list(value):
+    return list(dict.fromkeys(part.strip() for part in (value or '').split(',') if part.strip()))
+
+
+def api_fields(kind, args, primary=True):
+    """Fields asked for with ?fields[kind]= (or ?fields= for the main kind), all by default."""
+    fields = _api_list(args.get(f'fields[{kind}]') or (args.get('fields') if primary else None))
+    unknown = [name for name in fields if name not in API_FIELDS[kind]]
+    if unknown:
+        api_error(f"unknown {kind} field(s): {', '.join(unknown)}")
+    return tuple(fields or API_FIELDS[kind])
+
+
+def api_request(kind, args):
+    """Validated, hashable form of the query string; doubles as the cache key."""
+    include = _api_list(args.get('include'))
+    unknown = [name for name in include if name not in API_INCLUDES.get(kind, [])]
+    if unknown:
+        api_error(f"cannot include {', '.join(unknown)} with {kind}")
+    filters = []
+    for name, (column, convert) in API_FILTERS[kind].items():
+        if args.get(name):
+            try:
+                filters.append((name, convert(args[name])))
+            except ValueError:
+                api_error(f"{name} must be a number")
+    try:
+        ids = tuple(int(part) for part in _api_list(args.get('ids')))
+        after = int(args.get('cursor') or 0)
+        limit = int(args.get('limit') or current_app.config['API_PAGE_SIZE'])
+    except ValueError:
+        api_error("ids, cursor and limit must be integers")
+    max_items = current_app.config['API_MAX_PAGE_SIZE']
+    if not 1 <= limit <= max_items or len(ids) > max_items:
+        api_error(f"limit and the number of ids must be between 1 and {max_items}")
+    return (kind, api_fields(kind, args),
+            tuple((name, api_fields(name, args, primary=False)) for name in include),
+            tuple(filters), ids, after, limit)
+
+
+def _api_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def api_rows(model, fields, where, key=None, limit=None):
+    """[(key, {field: value})] for rows matching `where`, in id order.
+
+    The key column (id unless given) is always selected, so a page can be
+    continued and includes grouped even when the client didn't ask for it.
+    """
+    key = model.id if key is None else key
+    stmt = db.select(key, *[getattr(model, name) for name in fields]).where(*where).order_by(model.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return [(row[0], dict(zip(fields, map(_api_value, row[1:]))))
+            for row in db.session.execute(stmt)]
+
+
+def _api_include(items, include):
+    # One IN (...) query per included kind, like selectinload
+    place_ids = [place_id for place_id, _ in items]
+    for kind, fields in include:
+        model = CATALOG_MODELS[kind]
+        grouped = {}
+        for place_id, item in api_rows(model, fields, [model.place_id.in_(place_ids)], key=model.place_id):
+            grouped.setdefault(place_id, []).append(item)
+        for place_id, item in items:
+            item[kind] = grouped.get(place_id, [])
+
+
+def api_payload(spec):
+    kind, fields, include, filters, ids, after, limit = spec
+    model = CATALOG_MODELS[kind]
+    where = [API_FILTERS[kind][name][0] == value for name, value in filters]
+    if ids:
+        items = api_rows(model, fields, where + [model.id.in_(ids)])
+        _api_include(items, include)
+        found = dict(items)
+        return {'data': [found[item_id] for item_id in ids if item_id in found],
+                'missing': [item_id for item_id in ids if item_id not in found]}
+    items = api_rows(model, fields, where + [model.id > after], limit=limit + 1)
+    next_cursor = str(items[limit - 1][0]) if len(items) > limit else None
+    items = items[:limit]
+    _api_include(items, include)
+    return {'data': [item for _, item in items], 'next_cursor': next_cursor}
+
+
+def api_response(spec, build):
+    """JSON body from page_cache, built and serialized once per catalog version."""
+    def render():
+        payload = build(spec)
+        return None if payload is None else json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    body = page_cache.get(('api',) + spec, render)
+    if body is None:
+        api_error("not found", 404)
+    return current_app.response_class(body, mimetype='application/json')
+
+
+@api_bp.route('/api/v1/<any(places, hotels, transports):kind>')
+@conditional_page(lambda kind: catalog_updated_at())
+def api_list(kind):
+    """A page of places, hotels or transports, or a batch with ?ids=1,2,3."""
+    return api_response(api_request(kind, request.args), api_payload)
+
+
+@api_bp.route('/api/v1/<any(places, hotels, transports):kind>/<int:item_id>')
+@conditional_page(lambda kind, item_id: catalog_updated_at())
+def api_get(kind, item_id):
+    def build(spec):
+        payload = api_payload(spec)
+        return {'data': payload['data'][0]} if payload['data'] else None
+    spec = api_request(kind, request.args)
+    return api_response(spec[:4] + ((item_id,), 0, 1), build)
+
+
 # ------------ ADMIN ROUTES ------------
 
-@app.route('/admin/login', methods=['GET', 'POST'])
+@admin_bp.route('/admin/login', methods=['GET', 'POST'])
+@rate_limited(('login_ip', client_ip), ('login_user', form_field('username')))
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username', '')
@@ -247,373 +2785,299 @@ def admin_login():
         if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
             session['admin_logged_in'] = True
             flash("Logged in as admin.", "success")
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('admin.admin_dashboard'))
         else:
             flash("Invalid credentials", "danger")
     return render_template('admin_login.html')
 
 
-@app.route('/admin/logout')
+@admin_bp.route('/admin/logout')
 @login_required
 def admin_logout():
     session.pop('admin_logged_in', None)
     flash("Logged out.", "info")
-    return redirect(url_for('index'))
+    return redirect(url_for('public.index'))
 
 
-@app.route('/admin')
+@admin_bp.route('/admin')
 @login_required
 def admin_dashboard():
-    total_places = Place.query.count()
-    total_bookings = Booking.query.count()
-    pending = Booking.query.filter_by(status='Pending').count()
-    hotels_count = Hotel.query.count()
+    stats = dashboard_stats()
+    totals = stats['totals']
     
     return render_template(
         'admin_dashboard.html',
-        total_places=total_places,
-        total_bookings=total_bookings,
-        pending=pending,
-        hotels_count=hotels_count
+        total_places=int(totals.get('places', 0)),
+        total_bookings=int(totals.get('tour_bookings', 0)),
+        pending=int(totals.get('tour_bookings_Pending', 0)),
+        hotels_count=int(totals.get('hotels', 0)),
+        stats=stats,
+        service_statuses=SERVICE_BOOKING_STATUSES,
+        cache_stats=catalog_cache.stats(),
+        page_cache_stats=page_cache.stats(),
+        rate_limit_stats=rate_limiter.stats()
     )
 
 
-@app.route('/admin/places')
+@admin_bp.route('/admin/metrics')
+def admin_metrics():
+    """Request metrics and rate limit counts in Prometheus text format.
+
+    Open to a logged-in admin, or to a scraper sending
+    "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    if not (session.get('admin_logged_in') or metrics_token_ok()):
+        return redirect(url_for('admin.admin_login'))
+    if not current_app.config['METRICS_ENABLED']:
+        return Response("# metrics are off, set METRICS_ENABLED=1\n", status=404, mimetype='text/plain')
+    return Response(request_metrics.prometheus() + rate_limiter.prometheus(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@admin_bp.route('/admin/places')
 @login_required
 def admin_places():
     places = Place.query.order_by(Place.created_at.desc()).all()
     return render_template('admin_places.html', places=places)
-@app.route('/admin/places/<int:place_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/admin/places/<int:place_id>/edit', methods=['GET', 'POST'])
 @login_required
 def admin_edit_place(place_id):
     place = Place.query.get_or_404(place_id)
     
     if request.method == 'POST':
-        place.name = request.form.get('name', '').strip()
-        place.state = request.form.get('state', '').strip()
-        place.city = request.form.get('city', '').strip()
-        place.short_intro = request.form.get('short_intro', '').strip()
-        place.description = request.form.get('description', '').strip()
-        place.culture_description = request.form.get('culture_description', '').strip()
-        place.image_url = request.form.get('image_url', '').strip()
-        place.video_url = request.form.get('video_url', '').strip()
-        price_per_person = request.form.get('price_per_person', '0')
-        duration_days = request.form.get('duration_days', '1')
-
-        if not (place.name and place.state and place.short_intro and place.description and place.culture_description):
-            flash("Please fill all required fields.", "danger")
-            return redirect(url_for('admin_edit_place', place_id=place.id))
-
-        try:
-            place.price_per_person = float(price_per_person)
-        except ValueError:
-            place.price_per_person = 0.0
-
-        try:
-            place.duration_days = int(duration_days)
-        except ValueError:
-            place.duration_days = 1
-
+        values, error = parse_place_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_edit_place', place_id=place.id))
+
+        for key, value in values.items():
+            setattr(place, key, value)
+        update_search_index([place.id])
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Place updated successfully.", "success")
-        return redirect(url_for('admin_places'))
+        return redirect(url_for('admin.admin_places'))
 
     states = ["Karnataka", "Tamil Nadu", "Andhra Pradesh", "Maharashtra"]
     return render_template('admin_edit_place.html', place=place, states=states)
 
 
-@app.route('/admin/places/<int:place_id>/delete', methods=['POST'])
+@admin_bp.route('/admin/places/<int:place_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_place(place_id):
     place = Place.query.get_or_404(place_id)
     
-    # Check if there are any bookings for this place
-    has_bookings = Booking.query.filter_by(place_id=place_id).first() is not None
+    # Check if there are any bookings for this place, archived ones included
+    has_bookings = any(model.query.filter_by(place_id=place_id).first() is not None
+                       for model in ARCHIVES['tour'])
     
     if has_bookings:
         flash("Cannot delete this place because there are existing bookings. Please delete the bookings first or mark the place as inactive.", "danger")
     else:
         db.session.delete(place)
+        bump_stats(catalog_stats('places', place.id, -1))
+        DashboardStat.query.filter_by(scope='place', scope_key=str(place.id)).delete()
+        update_search_index([place.id])
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Place deleted successfully.", "success")
     
-    return redirect(url_for('admin_places'))
+    return redirect(url_for('admin.admin_places'))
 
 
-@app.route('/admin/places/add', methods=['GET', 'POST'])
+@admin_bp.route('/admin/places/add', methods=['GET', 'POST'])
 @login_required
 def admin_add_place():
     if request.method == 'POST':
-        name = request.form.get('name', '').strip()
-        state = request.form.get('state', '').strip()
-        city = request.form.get('city', '').strip()
-        short_intro = request.form.get('short_intro', '').strip()
-        description = request.form.get('description', '').strip()
-        culture_description = request.form.get('culture_description', '').strip()
-        image_url = request.form.get('image_url', '').strip()
-        video_url = request.form.get('video_url', '').strip()
-        price_per_person = request.form.get('price_per_person', '0')
-        duration_days = request.form.get('duration_days', '1')
-
-        if not (name and state and short_intro and description and culture_description):
-            flash("Please fill all required fields.", "danger")
-            return redirect(url_for('admin_add_place'))
-
-        try:
-            price_per_person = float(price_per_person)
-        except ValueError:
-            price_per_person = 0.0
+        values, error = parse_place_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_add_place'))
 
-        try:
-            duration_days = int(duration_days)
-        except ValueError:
-            duration_days = 1
-
-        place = Place(
-            name=name,
-            state=state,
-            city=city,
-            short_intro=short_intro,
-            description=description,
-            culture_description=culture_description,
-            image_url=image_url or None,
-            video_url=video_url or None,
-            price_per_person=price_per_person,
-            duration_days=duration_days
-        )
+        place = Place(**values)
         db.session.add(place)
+        db.session.flush()
+        update_search_index([place.id])
+        bump_stats(catalog_stats('places', None, 1))
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Place added successfully.", "success")
-        return redirect(url_for('admin_places'))
+        return redirect(url_for('admin.admin_places'))
 
     states = ["Karnataka", "Tamil Nadu", "Andhra Pradesh", "Maharashtra"]
     return render_template('admin_add_place.html', states=states)
-@app.route('/admin/hotels')
+@admin_bp.route('/admin/hotels')
 @login_required
 def admin_hotels():
-    hotels = Hotel.query.order_by(Hotel.created_at.desc()).all()
-    places = Place.query.all()
-    return render_template('admin_hotels.html', hotels=hotels, places=places)
-
-@app.route('/admin/hotels/add', methods=['GET', 'POST'])
+    filters = admin_filters()
+    query = apply_filters(Hotel.query.options(db.joinedload(Hotel.place)), Hotel, filters)
+    hotels, next_cursor = keyset_page(query, Hotel)
+    places = Place.query.order_by(Place.name).all()
+    return render_template('admin_hotels.html', hotels=hotels, places=places,
+                           filters=filters, next_cursor=next_cursor)
+
+@admin_bp.route('/admin/hotels/add', methods=['GET', 'POST'])
 @login_required
 def admin_add_hotel():
     if request.method == 'POST':
-        place_id = request.form.get('place_id')
-        name = request.form.get('name', '').strip()
-        description = request.form.get('description', '').strip()
-        price_per_night = request.form.get('price_per_night', '0')
-        rating = request.form.get('rating', '')
-        amenities = request.form.get('amenities', '').strip()
-        image_url = request.form.get('image_url', '').strip()
-        contact_info = request.form.get('contact_info', '').strip()
-
-        if not (place_id and name):
-            flash("Place and name are required.", "danger")
-            return redirect(url_for('admin_add_hotel'))
+        values, error = parse_hotel_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_add_hotel'))
 
-        try:
-            price_per_night = float(price_per_night)
-        except ValueError:
-            price_per_night = 0.0
-
-        try:
-            rating = float(rating) if rating else None
-        except ValueError:
-            rating = None
-
-        hotel = Hotel(
-            place_id=place_id,
-            name=name,
-            description=description or None,
-            price_per_night=price_per_night,
-            rating=rating,
-            amenities=amenities or None,
-            image_url=image_url or None,
-            contact_info=contact_info or None
-        )
+        hotel = Hotel(**values)
         db.session.add(hotel)
+        update_search_index([hotel.place_id])
+        bump_stats(catalog_stats('hotels', hotel.place_id, 1))
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Hotel added successfully.", "success")
-        return redirect(url_for('admin_hotels'))
+        return redirect(url_for('admin.admin_hotels'))
 
     places = Place.query.all()
     return render_template('admin_add_hotel.html', places=places)
-@app.route('/admin/hotels/<int:hotel_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/admin/hotels/<int:hotel_id>/edit', methods=['GET', 'POST'])
 @login_required
 def admin_edit_hotel(hotel_id):
     hotel = Hotel.query.get_or_404(hotel_id)
     
     if request.method == 'POST':
-        hotel.place_id = request.form.get('place_id')
-        hotel.name = request.form.get('name', '').strip()
-        hotel.description = request.form.get('description', '').strip()
-        price_per_night = request.form.get('price_per_night', '0')
-        rating = request.form.get('rating', '')
-        hotel.amenities = request.form.get('amenities', '').strip()
-        hotel.image_url = request.form.get('image_url', '').strip()
-        hotel.contact_info = request.form.get('contact_info', '').strip()
-
-        if not (hotel.place_id and hotel.name):
-            flash("Place and name are required.", "danger")
-            return redirect(url_for('admin_edit_hotel', hotel_id=hotel.id))
-
-        try:
-            hotel.price_per_night = float(price_per_night)
-        except ValueError:
-            hotel.price_per_night = 0.0
-
-        try:
-            hotel.rating = float(rating) if rating else None
-        except ValueError:
-            hotel.rating = None
-
+        values, error = parse_hotel_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_edit_hotel', hotel_id=hotel.id))
+
+        old_place_id = hotel.place_id
+        for key, value in values.items():
+            setattr(hotel, key, value)
+        if str(old_place_id) != str(hotel.place_id):
+            bump_stats(catalog_stats('hotels', old_place_id, -1)
+                       + catalog_stats('hotels', hotel.place_id, 1))
+        update_search_index([old_place_id, hotel.place_id])
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Hotel updated successfully.", "success")
-        return redirect(url_for('admin_hotels'))
+        return redirect(url_for('admin.admin_hotels'))
 
     places = Place.query.all()
     return render_template('admin_edit_hotel.html', hotel=hotel, places=places)
 
-@app.route('/admin/hotels/<int:hotel_id>/delete', methods=['POST'])
+@admin_bp.route('/admin/hotels/<int:hotel_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_hotel(hotel_id):
     hotel = Hotel.query.get_or_404(hotel_id)
     
-    # Check if there are any service bookings for this hotel
-    has_bookings = ServiceBooking.query.filter_by(hotel_id=hotel_id).first() is not None
+    # Check if there are any service bookings for this hotel, archived ones included
+    has_bookings = any(model.query.filter_by(hotel_id=hotel_id).first() is not None
+                       for model in ARCHIVES['service'])
     
     if has_bookings:
         flash("Cannot delete this hotel because there are existing service bookings. Please delete the bookings first or mark the hotel as inactive.", "danger")
     else:
         db.session.delete(hotel)
+        bump_stats(catalog_stats('hotels', hotel.place_id, -1))
+        update_search_index([hotel.place_id])
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Hotel deleted successfully.", "success")
     
-    return redirect(url_for('admin_hotels'))
+    return redirect(url_for('admin.admin_hotels'))
 
-@app.route('/admin/transport')
+@admin_bp.route('/admin/transport')
 @login_required
 def admin_transport():
-    transports = Transport.query.order_by(Transport.created_at.desc()).all()
-    places = Place.query.all()
-    return render_template('admin_transport.html', transports=transports, places=places)
-
-@app.route('/admin/transport/add', methods=['GET', 'POST'])
+    filters = admin_filters()
+    query = apply_filters(Transport.query.options(db.joinedload(Transport.place)), Transport, filters)
+    transports, next_cursor = keyset_page(query, Transport)
+    places = Place.query.order_by(Place.name).all()
+    return render_template('admin_transport.html', transports=transports, places=places,
+                           filters=filters, next_cursor=next_cursor)
+
+@admin_bp.route('/admin/transport/add', methods=['GET', 'POST'])
 @login_required
 def admin_add_transport():
     if request.method == 'POST':
-        place_id = request.form.get('place_id')
-        transport_type = request.form.get('transport_type')
-        name = request.form.get('name', '').strip()
-        description = request.form.get('description', '').strip()
-        price = request.form.get('price', '0')
-        capacity = request.form.get('capacity', '')
-        duration_hours = request.form.get('duration_hours', '')
-        operating_hours = request.form.get('operating_hours', '').strip()
-        contact_info = request.form.get('contact_info', '').strip()
+        values, error = parse_transport_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_add_transport'))
 
-        if not (place_id and transport_type and name):
-            flash("Place, transport type and name are required.", "danger")
-            return redirect(url_for('admin_add_transport'))
-
-        try:
-            price = float(price)
-        except ValueError:
-            price = 0.0
-
-        try:
-            capacity = int(capacity) if capacity else None
-        except ValueError:
-            capacity = None
-
-        try:
-            duration_hours = float(duration_hours) if duration_hours else None
-        except ValueError:
-            duration_hours = None
-
-        transport = Transport(
-            place_id=place_id,
-            transport_type=transport_type,
-            name=name,
-            description=description or None,
-            price=price,
-            capacity=capacity,
-            duration_hours=duration_hours,
-            operating_hours=operating_hours or None,
-            contact_info=contact_info or None
-        )
+        transport = Transport(**values)
         db.session.add(transport)
+        bump_stats(catalog_stats('transports', transport.place_id, 1))
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Transport service added successfully.", "success")
-        return redirect(url_for('admin_transport'))
+        return redirect(url_for('admin.admin_transport'))
 
     places = Place.query.all()
     return render_template('admin_add_transport.html', places=places)
-@app.route('/admin/transport/<int:transport_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/admin/transport/<int:transport_id>/edit', methods=['GET', 'POST'])
 @login_required
 def admin_edit_transport(transport_id):
     transport = Transport.query.get_or_404(transport_id)
     
     if request.method == 'POST':
-        transport.place_id = request.form.get('place_id')
-        transport.transport_type = request.form.get('transport_type')
-        transport.name = request.form.get('name', '').strip()
-        transport.description = request.form.get('description', '').strip()
-        price = request.form.get('price', '0')
-        capacity = request.form.get('capacity', '')
-        duration_hours = request.form.get('duration_hours', '')
-        transport.operating_hours = request.form.get('operating_hours', '').strip()
-        transport.contact_info = request.form.get('contact_info', '').strip()
-
-        if not (transport.place_id and transport.transport_type and transport.name):
-            flash("Place, transport type and name are required.", "danger")
-            return redirect(url_for('admin_edit_transport', transport_id=transport.id))
-
-        try:
-            transport.price = float(price)
-        except ValueError:
-            transport.price = 0.0
-
-        try:
-            transport.capacity = int(capacity) if capacity else None
-        except ValueError:
-            transport.capacity = None
-
-        try:
-            transport.duration_hours = float(duration_hours) if duration_hours else None
-        except ValueError:
-            transport.duration_hours = None
-
+        values, error = parse_transport_form(request.form)
+        if error:
+            flash(error, "danger")
+            return redirect(url_for('admin.admin_edit_transport', transport_id=transport.id))
+
+        old_place_id = transport.place_id
+        for key, value in values.items():
+            setattr(transport, key, value)
+        if str(old_place_id) != str(transport.place_id):
+            bump_stats(catalog_stats('transports', old_place_id, -1)
+                       + catalog_stats('transports', transport.place_id, 1))
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Transport service updated successfully.", "success")
-        return redirect(url_for('admin_transport'))
+        return redirect(url_for('admin.admin_transport'))
 
     places = Place.query.all()
     return render_template('admin_edit_transport.html', transport=transport, places=places)
 
-@app.route('/admin/transport/<int:transport_id>/delete', methods=['POST'])
+@admin_bp.route('/admin/transport/<int:transport_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_transport(transport_id):
     transport = Transport.query.get_or_404(transport_id)
     
-    # Check if there are any service bookings for this transport
-    has_bookings = ServiceBooking.query.filter_by(transport_id=transport_id).first() is not None
+    # Check if there are any service bookings for this transport, archived ones included
+    has_bookings = any(model.query.filter_by(transport_id=transport_id).first() is not None
+                       for model in ARCHIVES['service'])
     
     if has_bookings:
         flash("Cannot delete this transport service because there are existing service bookings. Please delete the bookings first or mark the transport as inactive.", "danger")
     else:
         db.session.delete(transport)
+        bump_stats(catalog_stats('transports', transport.place_id, -1))
+        bump_catalog_version()
         db.session.commit()
+        catalog_changed()
         flash("Transport service deleted successfully.", "success")
     
-    return redirect(url_for('admin_transport'))
+    return redirect(url_for('admin.admin_transport'))
 
-@app.route('/book-services/<int:place_id>', methods=['GET', 'POST'])
+@services_bp.route('/book-services/<int:place_id>', methods=['GET', 'POST'])
+@rate_limited(('booking_ip', client_ip), ('booking_email', form_field('customer_email')))
 def book_services(place_id):
-    place = Place.query.get_or_404(place_id)
+    place = get_place_or_404(place_id)
     
     if request.method == 'POST':
+        key = idempotency_key()
+        existing = replayed(ServiceBooking, key)
+        if existing:
+            flash("Your service booking has been submitted successfully! We will contact you shortly to confirm.", "success")
+            return redirect(url_for('services.service_booking_success', booking_id=existing.id))
+
         # Get form data
         customer_name = request.form.get('customer_name', '').strip()
         customer_email = request.form.get('customer_email', '').strip()
@@ -629,11 +3093,15 @@ def book_services(place_id):
         # Validation
         if not (customer_name and customer_email and customer_phone):
             flash("Please fill in all required customer details.", "danger")
-            return redirect(url_for('book_services', place_id=place.id))
+            return redirect(url_for('services.book_services', place_id=place.id))
+
+        if has_line_break(customer_email):
+            flash("Please enter a valid email address.", "danger")
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         if not (hotel_id or transport_id):
             flash("Please select at least one service (hotel or transport).", "danger")
-            return redirect(url_for('book_services', place_id=place.id))
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         # Date validation
         try:
@@ -641,21 +3109,21 @@ def book_services(place_id):
             check_out_date = datetime.strptime(check_out_str, '%Y-%m-%d').date() if check_out_str else None
         except ValueError:
             flash("Invalid date format.", "danger")
-            return redirect(url_for('book_services', place_id=place.id))
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         if check_in_date and check_out_date:
             if check_in_date >= check_out_date:
                 flash("Check-out date must be after check-in date.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+                return redirect(url_for('services.book_services', place_id=place.id))
             
             if check_in_date < datetime.now().date():
                 flash("Check-in date cannot be in the past.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+                return redirect(url_for('services.book_services', place_id=place.id))
             
             num_days = (check_out_date - check_in_date).days
             if num_days <= 0:
                 flash("Minimum stay must be at least 1 day.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+                return redirect(url_for('services.book_services', place_id=place.id))
         else:
             num_days = 1
         
@@ -667,7 +3135,7 @@ def book_services(place_id):
                 raise ValueError
         except ValueError:
             flash("Number of people and rooms must be positive numbers.", "danger")
-            return redirect(url_for('book_services', place_id=place.id))
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         # Calculate pricing
         hotel_total = 0.0
@@ -675,75 +3143,60 @@ def book_services(place_id):
         hotel = None
         transport = None
         
+        # Not from the cached place: prices and room counts may have been
+        # edited since it was loaded
         if hotel_id:
-            hotel = Hotel.query.get(hotel_id)
+            hotel = _find_by_id(Hotel, place.id, hotel_id)
             if not hotel:
                 flash("Selected hotel not found.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+                return redirect(url_for('services.book_services', place_id=place.id))
             hotel_total = hotel.price_per_night * num_days * num_rooms
         
         if transport_id:
-            transport = Transport.query.get(transport_id)
+            transport = _find_by_id(Transport, place.id, transport_id)
             if not transport:
                 flash("Selected transport service not found.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+                return redirect(url_for('services.book_services', place_id=place.id))
             transport_total = transport.price * num_people
         
         total_amount = hotel_total + transport_total
         
-        # Check for existing hotel bookings (date conflict)
-        if hotel_id and check_in_date and check_out_date:
-            existing_hotel_booking = ServiceBooking.query.filter(
-                ServiceBooking.hotel_id == hotel_id,
-                ServiceBooking.check_in_date <= check_out_date,
-                ServiceBooking.check_out_date >= check_in_date,
-                ServiceBooking.status.in_(['Pending', 'Confirmed'])
-            ).first()
-            
-            if existing_hotel_booking:
+        # Conflict and duplicate rules, checked in this order in one query
+        checks = []
+        if hotel and check_in_date and check_out_date:
+            # Not enough rooms left on some night of the stay
+            if num_rooms > hotel.total_rooms:
                 flash("Sorry, the selected hotel is not available for the chosen dates. Please select different dates or another hotel.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
-        
-        # Check for duplicate service bookings (same user, same service, same date)
-        if hotel_id and check_in_date:
-            # Check if user already has a booking for the same hotel on the same dates
-            duplicate_hotel_booking = ServiceBooking.query.filter(
-                ServiceBooking.customer_email == customer_email,
-                ServiceBooking.hotel_id == hotel_id,
-                ServiceBooking.check_in_date == check_in_date,
-                ServiceBooking.status.in_(['Pending', 'Confirmed'])
-            ).first()
-            
-            if duplicate_hotel_booking:
-                flash(f"You already have a booking for this hotel on {check_in_str}. Please choose a different date or contact us to modify your existing booking.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
-        
-        if transport_id:
-            # For transport, check if user already has a booking for the same transport service
-            # Since transport doesn't have dates in the same way, we'll check for same day bookings
-            duplicate_transport_booking = ServiceBooking.query.filter(
-                ServiceBooking.customer_email == customer_email,
-                ServiceBooking.transport_id == transport_id,
-                ServiceBooking.created_at >= datetime.now().date(),
-                ServiceBooking.status.in_(['Pending', 'Confirmed'])
-            ).first()
-            
-            if duplicate_transport_booking:
-                flash("You already have a booking for this transport service today. Please contact us for multiple bookings.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
-        
-        # Check if user has any service booking for the same place on the same dates
+                return redirect(url_for('services.book_services', place_id=place.id))
+            checks.append(('hotel_full', hotel_full(hotel, check_in_date, check_out_date, num_rooms)))
+        if hotel and check_in_date:
+            # Same user, same hotel, same check-in date
+            checks.append(('duplicate_hotel', duplicate_hotel_booking(customer_email, hotel.id, check_in_date)))
+        if transport:
+            # Transport has no dates of its own, so one booking per service per day
+            checks.append(('duplicate_transport', duplicate_transport_booking(
+                customer_email, transport.id, datetime.now().date())))
         if check_in_date:
-            existing_place_service_booking = ServiceBooking.query.filter(
-                ServiceBooking.customer_email == customer_email,
-                ServiceBooking.place_id == place_id,
-                ServiceBooking.check_in_date == check_in_date,
-                ServiceBooking.status.in_(['Pending', 'Confirmed'])
-            ).first()
-            
-            if existing_place_service_booking:
-                flash(f"You already have a service booking for {place.name} on {check_in_str}. Please choose a different date or contact us to modify your existing booking.", "danger")
-                return redirect(url_for('book_services', place_id=place.id))
+            # Any service booking for this place on the same check-in date
+            checks.append(('duplicate_place', duplicate_place_service_booking(
+                customer_email, place.id, check_in_date)))
+
+        conflict_messages = {
+            'hotel_full': "Sorry, the selected hotel is not available for the chosen dates. Please select different dates or another hotel.",
+            'duplicate_hotel': f"You already have a booking for this hotel on {check_in_str}. Please choose a different date or contact us to modify your existing booking.",
+            'duplicate_transport': "You already have a booking for this transport service today. Please contact us for multiple bookings.",
+            'duplicate_place': f"You already have a service booking for {place.name} on {check_in_str}. Please choose a different date or contact us to modify your existing booking.",
+        }
+        conflict = first_conflict(checks)
+        if conflict:
+            # The conflicting booking may be this same form, committed by
+            # a replay since the lookup above
+            existing = replayed(ServiceBooking, key)
+            if existing:
+                flash("Your service booking has been submitted successfully! We will contact you shortly to confirm.", "success")
+                return redirect(url_for('services.service_booking_success', booking_id=existing.id))
+            flash(conflict_messages[conflict], "danger")
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         # Create service booking
         service_booking = ServiceBooking(
@@ -761,18 +3214,40 @@ def book_services(place_id):
             special_requests=special_requests,
             hotel_total=hotel_total,
             transport_total=transport_total,
-            total_amount=total_amount
+            total_amount=total_amount,
+            idempotency_key=key
         )
         
-        db.session.add(service_booking)
-        db.session.commit()
+        # The checks above give friendly messages for the common case; the
+        # guarded occupancy update and the unique index settle races.
+        try:
+            if hotel and check_in_date and check_out_date:
+                if not adjust_occupancy(hotel.id, check_in_date, check_out_date, num_rooms,
+                                        capacity=hotel.total_rooms):
+                    db.session.rollback()
+                    flash(conflict_messages['hotel_full'], "danger")
+                    return redirect(url_for('services.book_services', place_id=place.id))
+            db.session.add(service_booking)
+            bump_stats(booking_stats('service', place.id, None, 'Pending', total_amount, new=True))
+            queue_notifications('service', service_booking)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            existing = replayed(ServiceBooking, key)
+            if existing:
+                flash("Your service booking has been submitted successfully! We will contact you shortly to confirm.", "success")
+                return redirect(url_for('services.service_booking_success', booking_id=existing.id))
+            flash(conflict_messages['duplicate_place'], "danger")
+            return redirect(url_for('services.book_services', place_id=place.id))
         
         flash("Your service booking has been submitted successfully! We will contact you shortly to confirm.", "success")
-        return redirect(url_for('service_booking_success', booking_id=service_booking.id))
+        return redirect(url_for('services.service_booking_success', booking_id=service_booking.id))
     
-    # GET request - show available services
-    hotels = Hotel.query.filter_by(place_id=place_id).all()
-    transports = Transport.query.filter_by(place_id=place_id).all()
+    # GET request - show available services (preloaded with the cached place)
+    hotels = place.hotels
+    transports = place.transports
+    check_in_date, check_out_date = _stay_from_args()
+    availability = rooms_free(hotels, check_in_date, check_out_date) if check_in_date else None
     
     # Calculate dates for form min values
     today = datetime.now().date()
@@ -782,57 +3257,523 @@ def book_services(place_id):
                          place=place, 
                          hotels=hotels, 
                          transports=transports,
+                         availability=availability,
+                         idempotency_key=uuid.uuid4().hex,
+                         check_in=check_in_date.isoformat() if check_in_date else '',
+                         check_out=check_out_date.isoformat() if check_out_date else '',
                          today=today.isoformat(),
                          tomorrow=tomorrow.isoformat())
 
-@app.route('/admin/bookings')
+@services_bp.route('/book-services/<int:place_id>/availability')
+def hotel_availability(place_id):
+    """Rooms free per hotel of a place for ?check_in=&check_out=."""
+    place = get_place_or_404(place_id)
+    check_in_date, check_out_date = _stay_from_args()
+    if not check_in_date:
+        return jsonify(error="check_in and check_out must be valid dates, check_in first"), 400
+    free = rooms_free(place.hotels, check_in_date, check_out_date)
+    return jsonify(hotels={str(hotel_id): rooms for hotel_id, rooms in free.items()})
+
+
+@services_bp.route('/book-services/<int:place_id>/quote')
+def package_quote(place_id):
+    """Totals for every hotel/transport package for ?num_people=&num_rooms=[&check_in=&check_out=].
+
+    Without a valid stay the hotel is priced for one night, as book_services does.
+    """
+    place = get_place_or_404(place_id)
+    check_in_date, check_out_date = _stay_from_args()
+    nights = (check_out_date - check_in_date).days if check_in_date else 1
+    try:
+        people = int(request.args.get('num_people', 1))
+        rooms = int(request.args.get('num_rooms', 1))
+    except ValueError:
+        people = rooms = 0
+    if people <= 0 or rooms <= 0:
+        return jsonify(error="num_people and num_rooms must be positive numbers"), 400
+    return jsonify(nights=nights, num_people=people, num_rooms=rooms,
+                   quotes=package_quotes(place, nights, people, rooms))
+
+@admin_bp.route('/admin/bookings')
 @login_required
 def admin_bookings():
-    bookings = Booking.query.order_by(Booking.created_at.desc()).all()
-    return render_template('admin_bookings.html', bookings=bookings)
+    filters = admin_filters()
+    model = listing_model('tour', filters)
+    query = apply_filters(model.query.options(db.joinedload(model.place)),
+                          model, filters, model.travel_date)
+    bookings, next_cursor = keyset_page(query, model)
+    places = Place.query.order_by(Place.name).all()
+    return render_template('admin_bookings.html', bookings=bookings, places=places,
+                           statuses=BOOKING_STATUSES, filters=filters, next_cursor=next_cursor)
 
 
-@app.route('/admin/bookings/<int:booking_id>/status', methods=['POST'])
+@admin_bp.route('/admin/bookings/export.<fmt>')
+@login_required
+def admin_export_bookings(fmt):
+    return export_response('tour', fmt)
+
+
+@admin_bp.route('/admin/bookings/<int:booking_id>/status', methods=['POST'])
 @login_required
 def admin_update_booking_status(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     new_status = request.form.get('status')
-    if new_status in ['Pending', 'Confirmed', 'Rejected']:
+    if new_status in BOOKING_STATUSES:
+        if new_status != booking.status:
+            bump_stats(status_change_stats('tour', booking, booking.status, new_status,
+                                           tour_revenue(booking)))
+            queue_notifications('tour', booking, new_status)
         booking.status = new_status
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Reactivated while the customer holds another active booking that day
+            db.session.rollback()
+            flash("That would clash with another active booking for the same customer and date.", "danger")
+            return redirect(url_for('admin.admin_bookings'))
         flash("Booking status updated.", "success")
     else:
         flash("Invalid status.", "danger")
-    return redirect(url_for('admin_bookings'))
-@app.route('/service-booking-success/<int:booking_id>')
+    return redirect(url_for('admin.admin_bookings'))
+
+
+@admin_bp.route('/admin/bookings/status', methods=['POST'])
+@login_required
+def admin_bulk_booking_status():
+    def changes(booking, new_status):
+        queue_notifications('tour', booking, new_status)
+        return status_change_stats('tour', booking, booking.status, new_status, tour_revenue(booking))
+    return bulk_status_response(Booking, BOOKING_STATUSES, changes)
+@services_bp.route('/service-booking-success/<int:booking_id>')
 def service_booking_success(booking_id):
     booking = ServiceBooking.query.get_or_404(booking_id)
     return render_template('service_booking_success.html', booking=booking)
 
 # Add admin route to manage service bookings
-@app.route('/admin/service-bookings')
+@admin_bp.route('/admin/service-bookings')
 @login_required
 def admin_service_bookings():
-    service_bookings = ServiceBooking.query.order_by(ServiceBooking.created_at.desc()).all()
-    return render_template('admin_service_bookings.html', service_bookings=service_bookings)
+    filters = admin_filters()
+    model = listing_model('service', filters)
+    query = model.query.options(
+        db.joinedload(model.place),
+        db.joinedload(model.hotel),
+        db.joinedload(model.transport)
+    )
+    query = apply_filters(query, model, filters, model.check_in_date)
+    service_bookings, next_cursor = keyset_page(query, model)
+    places = Place.query.order_by(Place.name).all()
+    return render_template('admin_service_bookings.html', service_bookings=service_bookings,
+                           places=places, statuses=SERVICE_BOOKING_STATUSES,
+                           filters=filters, next_cursor=next_cursor)
+
+@admin_bp.route('/admin/service-bookings/export.<fmt>')
+@login_required
+def admin_export_service_bookings(fmt):
+    return export_response('service', fmt)
 
-@app.route('/admin/service-bookings/<int:booking_id>/status', methods=['POST'])
+@admin_bp.route('/admin/service-bookings/<int:booking_id>/status', methods=['POST'])
 @login_required
 def admin_update_service_booking_status(booking_id):
     booking = ServiceBooking.query.get_or_404(booking_id)
     new_status = request.form.get('status')
-    if new_status in ['Pending', 'Confirmed', 'Cancelled']:
-        booking.status = new_status
-        db.session.commit()
+    if new_status in SERVICE_BOOKING_STATUSES:
+        if new_status != booking.status:
+            bump_stats(status_change_stats('service', booking, booking.status, new_status,
+                                           booking.total_amount))
+            queue_notifications('service', booking, new_status)
+        try:
+            move_rooms(booking, new_status)
+            booking.status = new_status
+            db.session.commit()
+        except NoRoomsLeft:
+            db.session.rollback()
+            flash("The hotel is full on some of this booking's nights, so it can't be reactivated.", "danger")
+            return redirect(url_for('admin.admin_service_bookings'))
+        except IntegrityError:
+            # Reactivated while the customer holds another active booking for that place and date
+            db.session.rollback()
+            flash("That would clash with another active booking for the same customer and date.", "danger")
+            return redirect(url_for('admin.admin_service_bookings'))
         flash("Service booking status updated.", "success")
     else:
         flash("Invalid status.", "danger")
-    return redirect(url_for('admin_service_bookings'))
+    return redirect(url_for('admin.admin_service_bookings'))
+
+
+@admin_bp.route('/admin/service-bookings/status', methods=['POST'])
+@login_required
+def admin_bulk_service_booking_status():
+    def changes(booking, new_status):
+        move_rooms(booking, new_status)
+        queue_notifications('service', booking, new_status)
+        return status_change_stats('service', booking, booking.status, new_status, booking.total_amount)
+    return bulk_status_response(ServiceBooking, SERVICE_BOOKING_STATUSES, changes)
+
+
+# ------------ DATABASE MAINTENANCE ------------
+
+def _add_missing_columns():
+    # Columns added to a model after its table exists; they all carry a
+    # server_default so existing rows get a value.
+    inspector = db.inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}')
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def upgrade_database():
+    """Create missing tables, columns and indexes.
+
+    create_all() skips tables that already exist, so columns and indexes
+    added to a model later are never created on an existing database (such
+    as instance/cultural_tours.db). This fills those in and is safe to run
+    on every start.
+    """
+    had_occupancy = db.inspect(db.engine).has_table(HotelNight.__tablename__)
+    had_stats = db.inspect(db.engine).has_table(DashboardStat.__tablename__)
+    added = _add_missing_columns()
+    db.create_all()
+    created = []
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if not db.inspect(db.engine).has_index(table.name, index.name):
+                try:
+                    index.create(db.engine)
+                except IntegrityError:
+                    # Unique index over rows that already break it
+                    current_app.logger.warning("Skipped %s: existing rows violate it, clean them up and re-run", index.name)
+                    continue
+                created.append(index.name)
+    if not had_occupancy:
+        rebuild_occupancy()
+    if not had_stats:
+        rebuild_stats()
+    if create_search_index():
+        rebuild_search_index()
+        created.append('place_search')
+    return added + created
+
+
+@admin_bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create any missing tables and indexes."""
+    created = upgrade_database()
+    click.echo(f"Added {len(created)} column(s)/index(es): {', '.join(created) or '-'}")
+
+
+@admin_bp.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Rebuild the admin dashboard counters from the booking tables."""
+    click.echo(f"Rebuilt {rebuild_stats()} dashboard counter(s)")
+
+
+@admin_bp.cli.command('export-bookings')
+@click.option('--kind', type=click.Choice(['tour', 'service']), default='tour')
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv')
+@click.option('--status', default=None)
+@click.option('--date-from', default=None, help='YYYY-MM-DD, on travel / check-in date')
+@click.option('--date-to', default=None, help='YYYY-MM-DD, on travel / check-in date')
+@click.option('--archived', is_flag=True, help='export the archived bookings instead')
+@click.option('--output', type=click.File('w'), default='-')
+def export_bookings_command(kind, fmt, status, date_from, date_to, archived, output):
+    """Stream bookings or service bookings as CSV or JSON lines."""
+    filters = {
+        'status': status,
+        'place_id': None,
+        'date_from': _parse_date(date_from),
+        'date_to': _parse_date(date_to),
+        'archived': archived,
+    }
+    for chunk in export_chunks(kind, filters, fmt):
+        output.write(chunk)
+
+
+@admin_bp.cli.command('import-catalog')
+@click.option('--places', type=click.Path(exists=True, dir_okay=False), help='CSV of places')
+@click.option('--hotels', type=click.Path(exists=True, dir_okay=False), help='CSV of hotels')
+@click.option('--transports', type=click.Path(exists=True, dir_okay=False), help='CSV of transports')
+@click.option('--json', 'json_path', type=click.Path(exists=True, dir_okay=False),
+              help='JSON object with "places", "hotels" and/or "transports" lists')
+@click.option('--batch-size', default=500, show_default=True, help='Rows per INSERT batch')
+def import_catalog_command(places, hotels, transports, json_path, batch_size):
+    """Bulk-insert or update places, hotels and transports in one transaction."""
+    sources = {kind: [] for kind in CATALOG_COLUMNS}
+    if json_path:
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise click.UsageError('JSON file must hold an object of places/hotels/transports lists')
+        for kind in CATALOG_COLUMNS:
+            sources[kind].extend(data.get(kind) or [])
+    for kind, path in (('places', places), ('hotels', hotels), ('transports', transports)):
+        if path:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                sources[kind].extend(csv.DictReader(f))
+
+    started = time.perf_counter()
+    counts, errors = import_catalog(sources, batch_size)
+    if errors:
+        db.session.rollback()
+        for error in errors:
+            click.echo(error, err=True)
+        click.echo(f"Nothing imported: {len(errors)} invalid row(s)", err=True)
+        raise SystemExit(1)
+    bump_catalog_version()
+    db.session.commit()
+    catalog_changed()
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    click.echo(f"Imported {', '.join(f'{n} {kind}' for kind, n in counts.items())} "
+          f"in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.0f} rows/s)")
+
+
+@admin_bp.cli.command('export-catalog')
+@click.option('--places', type=click.File('w'), help='write places as CSV')
+@click.option('--hotels', type=click.File('w'), help='write hotels as CSV')
+@click.option('--transports', type=click.File('w'), help='write transports as CSV')
+@click.option('--json', 'json_file', type=click.File('w'),
+              help='write everything as one JSON object (the default, to stdout)')
+def export_catalog_command(places, hotels, transports, json_file):
+    """Dump places, hotels and transports in the import-catalog layout."""
+    csv_files = {'places': places, 'hotels': hotels, 'transports': transports}
+    for kind, f in csv_files.items():
+        if f:
+            writer = csv.DictWriter(f, fieldnames=CATALOG_COLUMNS[kind])
+            writer.writeheader()
+            writer.writerows(export_catalog(kind))
+    if json_file or not any(csv_files.values()):
+        json.dump({kind: export_catalog(kind) for kind in CATALOG_COLUMNS},
+                  json_file or click.get_text_stream('stdout'), indent=2)
+
+
+@admin_bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-index every place for full-text search."""
+    if not search_enabled():
+        click.echo("No FTS5 search index on this database; search uses the catalog fallback")
+        return
+    click.echo(f"Indexed {rebuild_search_index()} place(s)")
+
+
+@admin_bp.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Recompute per-night hotel occupancy from service bookings."""
+    click.echo(f"Rebuilt {rebuild_occupancy()} hotel night(s)")
+
+
+@admin_bp.cli.command('archive-bookings')
+@click.option('--days', type=int, default=None, help='archive trips that ended this many days ago '
+              '[default: ARCHIVE_AFTER_DAYS]')
+@click.option('--batch-size', type=int, default=None, help='bookings per transaction [default: ARCHIVE_BATCH_SIZE]')
+def archive_bookings_command(days, batch_size):
+    """Move finished bookings into the archive tables; safe to interrupt and re-run."""
+    days = current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days
+    cutoff = datetime.utcnow().date() - timedelta(days=days)
+    started = time.perf_counter()
+    moved = archive_bookings(cutoff, batch_size)
+    elapsed = time.perf_counter() - started
+    total = moved['tour'] + moved['service']
+    click.echo(f"Archived {moved['tour']} booking(s) and {moved['service']} service booking(s) that ended "
+          f"before {cutoff} in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.0f} rows/s); "
+          f"dropped {moved['hotel_nights']} past hotel night(s). Live now: {Booking.query.count()} "
+          f"booking(s), {ServiceBooking.query.count()} service booking(s)")
+
+
+@admin_bp.cli.command('notify-worker')
+@click.option('--threads', type=int, default=None, help='delivery threads [default: NOTIFY_WORKERS]')
+@click.option('--once', is_flag=True, help='deliver what is due now, then exit')
+def notify_worker_command(threads, once):
+    """Send queued customer emails and SMS from the outbox."""
+    app = current_app._get_current_object()
+    if once:
+        totals = {'sent': 0, 'retry': 0, 'failed': 0}
+        while True:
+            outcome = deliver_notifications()
+            if not sum(outcome.values()):
+                break
+            for key, count in outcome.items():
+                totals[key] += count
+        click.echo(f"Sent {totals['sent']}, {totals['retry']} to retry, {totals['failed']} failed; "
+              f"outbox now {outbox_stats() or 'empty'}")
+        return
+    stop = threading.Event()
+    workers = start_notification_workers(app, max(threads or app.config['NOTIFY_WORKERS'], 1), stop)
+    click.echo(f"Delivering with {len(workers)} thread(s), Ctrl+C to stop")
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+# dialect -> (statement prefix, plan step from a result row, whether a step
+# reads a whole table). PostgreSQL prefers a seq scan on small tables, so
+# seq scans are switched off there and only show up where no index fits.
+QUERY_PLANS = {
+    'sqlite': ('EXPLAIN QUERY PLAN', lambda row: row[-1], lambda step: step.startswith('SCAN')),
+    'postgresql': ('EXPLAIN', lambda row: row[0].strip(), lambda step: 'Seq Scan' in step),
+}
+
+
+def explain_booking_checks():
+    """The query plan of every booking check (and the archive job's batch
+    queries), as (name, [plan steps]). SQLite and PostgreSQL only."""
+    dialect = db.engine.dialect.name
+    if dialect not in QUERY_PLANS:
+        raise NotImplementedError(f"No query plan check for {dialect} databases")
+    explain, step_of, _ = QUERY_PLANS[dialect]
+    day = datetime.now().date()
+    checks = [
+        ('duplicate_tour_booking', duplicate_tour_booking('a@example.com', day)),
+        ('hotel_full', hotel_full(Hotel(id=1, total_rooms=10), day, day + timedelta(days=1), 1)),
+        ('duplicate_hotel_booking', duplicate_hotel_booking('a@example.com', 1, day)),
+        ('duplicate_transport_booking', duplicate_transport_booking('a@example.com', 1, day)),
+        ('duplicate_place_service_booking', duplicate_place_service_booking('a@example.com', 1, day)),
+        ('archive_due_tour', db.session.query(Booking.id).filter(archive_due('tour', day)).limit(1)),
+        ('archive_due_service', db.session.query(ServiceBooking.id).filter(archive_due('service', day)).limit(1)),
+    ]
+    connection = db.session.connection()
+    if dialect == 'postgresql':
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plans = []
+    for name, query in checks:
+        sql = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+        rows = connection.exec_driver_sql(f'{explain} {sql}').fetchall()
+        plans.append((name, [step_of(row) for row in rows]))
+    db.session.rollback()
+    return plans
+
+
+@admin_bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any booking check falls back to a full table scan."""
+    if db.engine.dialect.name not in QUERY_PLANS:
+        raise click.ClickException(f"check-query-plans supports {' and '.join(QUERY_PLANS)}, "
+                                   f"not {db.engine.dialect.name}")
+    _, _, full_scan = QUERY_PLANS[db.engine.dialect.name]
+    failed = False
+    for name, plan in explain_booking_checks():
+        scans = [step for step in plan if full_scan(step)]
+        failed = failed or bool(scans)
+        click.echo(f"{'FAIL' if scans else 'ok  '} {name}: {'; '.join(plan)}")
+    if failed:
+        raise SystemExit(1)
+
+
+def warm_up(app):
+    """Do a worker's first-request work ahead of time; returns seconds taken.
+
+    Compiles every template (into the template cache, when there is one),
+    loads the catalog, its facet index and numpy, then closes the pooled
+    connections. In a preloading master (gunicorn --preload
+    'app:create_app(warm=True)') the workers fork with all of this already
+    in memory and without sharing any database socket.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        sync_catalog_version(force=True)
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        facet_index()
+        catalog_last_modified()
+        search_enabled()
+        optional_module('numpy')
+        db.engine.dispose()
+    return time.perf_counter() - started
+
+
+@admin_bp.cli.command('prepare')
+def prepare_command():
+    """Upgrade the schema and compile the templates, once per deploy.
+
+    Run before starting the workers, so none of them has to.
+    """
+    started = time.perf_counter()
+    created = upgrade_database()
+    upgraded = time.perf_counter()
+    seconds = warm_up(current_app._get_current_object())
+    click.echo(f"Added {len(created)} column(s)/index(es) in {upgraded - started:.2f}s: {', '.join(created) or '-'}")
+    click.echo(f"Warmed up in {seconds:.2f}s")
 
 
 # ------------ INIT ------------
 
+def create_app(config=None, warm=False):
+    """Build an application: settings, database, caches, hooks and routes.
+
+    `config` overrides default_config(), e.g. {'SQLALCHEMY_DATABASE_URI':
+    'sqlite://'} for a throwaway test app. The database is not touched;
+    run `flask prepare` (or upgrade_database()) for the schema. With
+    `warm`, warm_up() runs before the app is returned.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    app.config.from_mapping(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+
+    app.extensions['catalog_cache'] = CatalogCache(app.config['CATALOG_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL'])
+    app.extensions['page_cache'] = CatalogCache(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+    app.extensions['quote_cache'] = CatalogCache(app.config['QUOTE_CACHE_SIZE'], app.config['CATALOG_CACHE_TTL'])
+    app.extensions['catalog_version'] = {'version': None, 'changed_at': None, 'checked': float('-inf')}
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.extensions['rate_limiter'] = make_rate_limiter(app)
+    if app.config['TRUSTED_PROXIES']:
+        # Client IP (for rate limits) and scheme from the proxies' X-Forwarded-* headers
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    cache_dir = app.config['TEMPLATE_CACHE_DIR']
+    if cache_dir is None:
+        cache_dir = os.path.join(app.instance_path, 'template-cache')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    app.before_request(start_request_metrics)
+    app.before_request(sync_catalog_version)
+    app.after_request(compress_response)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    request_finished.connect(record_request_metrics, app)
+
+    for blueprint in (public_bp, services_bp, api_bp, admin_bp):
+        app.register_blueprint(blueprint)
+    if warm:
+        warm_up(app)
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `flask --app app run` get a default app,
+    # built on first use rather than on import
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
+    app = create_app()
+    # The debug reloader runs this twice: a parent that only watches files
+    # and restarts the server, and the serving child (WERKZEUG_RUN_MAIN).
+    # Only the child upgrades the schema and starts the background threads.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            upgrade_database()
+        start_stats_reconciler(app)
+        start_notification_workers(app)
     app.run(debug=True)
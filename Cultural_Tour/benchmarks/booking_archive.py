@@ -0,0 +1,125 @@
+"""Hot-path timings before and after archiving old bookings.
+
+Seeds --bookings tour bookings and half as many service bookings with
+trips spread over the last --days days, times a few requests and queries
+that read the live booking tables, runs archive_bookings() with the
+--retention window, then times the same things again:
+
+    count       COUNT(*) of bookings and service bookings
+    listing     /admin/bookings?status=Pending, first page
+    filtered    /admin/service-bookings?place_id=..., first page
+    book        a service-booking POST (conflict checks, index upkeep)
+
+    python benchmarks/booking_archive.py [--bookings 100000] [--days 1095] [--retention 365]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'booking_archive.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+os.environ['RATE_LIMIT_ENABLED'] = '0'  # every request comes from one client here
+
+from app import (  # noqa: E402
+    create_app, db, Booking, ServiceBooking, BookingArchive, ServiceBookingArchive, Hotel, archive_bookings
+)
+import synthetic_data  # noqa: E402
+
+
+def median_ms(func, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def measure(app, hotels, runs):
+    admin = app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    visitor = app.test_client()
+    rng = random.Random(len(hotels))
+    place_id = hotels[0][1]
+
+    def count():
+        with app.app_context():
+            Booking.query.count()
+            ServiceBooking.query.count()
+
+    def get(path):
+        def run():
+            assert admin.get(path).status_code == 200
+        return run
+
+    def book():
+        hotel_id, hotel_place_id = rng.choice(hotels)
+        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+        response = visitor.post(f'/book-services/{hotel_place_id}', data={
+            'customer_name': 'Archive Bench',
+            'customer_email': f'{uuid.uuid4().hex[:12]}@example.com',
+            'customer_phone': '9999999999',
+            'hotel_id': hotel_id,
+            'check_in': check_in.isoformat(),
+            'check_out': (check_in + timedelta(days=2)).isoformat(),
+            'num_rooms': '1',
+            'idempotency_key': uuid.uuid4().hex,
+        })
+        assert response.status_code == 302, response.status_code
+
+    return {
+        'count': median_ms(count, runs),
+        'listing': median_ms(get('/admin/bookings?status=Pending'), runs),
+        'filtered': median_ms(get(f'/admin/service-bookings?place_id={place_id}'), runs),
+        'book': median_ms(book, runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--places', type=int, default=200)
+    parser.add_argument('--days', type=int, default=1095, help='history the trips are spread over')
+    parser.add_argument('--retention', type=int, default=365, help='archive trips that ended this many days ago')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    synthetic_data.seed(places=args.places, bookings=args.bookings,
+                        service_bookings=args.bookings // 2, days=args.days)
+    print(f"Seeded {args.bookings} + {args.bookings // 2} bookings in {time.perf_counter() - started:.1f}s")
+    app = create_app({'TEMPLATE_CACHE_DIR': ''})
+    app.logger.disabled = True
+    with app.app_context():
+        hotels = [tuple(row) for row in db.session.execute(db.select(Hotel.id, Hotel.place_id).order_by(Hotel.id))]
+
+    before = measure(app, hotels, args.runs)
+    with app.app_context():
+        cutoff = date.today() - timedelta(days=args.retention)
+        started = time.perf_counter()
+        moved = archive_bookings(cutoff, args.batch_size)
+        elapsed = time.perf_counter() - started
+        live = Booking.query.count() + ServiceBooking.query.count()
+        archived = BookingArchive.query.count() + ServiceBookingArchive.query.count()
+    moved_rows = moved['tour'] + moved['service']
+    print(f"Archived {moved_rows} bookings before {cutoff} in {elapsed:.2f}s "
+          f"({moved_rows / elapsed:.0f} rows/s, {args.batch_size} per transaction); "
+          f"{live} live, {archived} archived")
+    after = measure(app, hotels, args.runs)
+
+    print(f"\n{'':10} {'before':>10} {'after':>10}   (median ms of {args.runs})")
+    for name in before:
+        print(f"{name:10} {before[name]:10.2f} {after[name]:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Concurrent booking stress test.
+
+Fires simultaneous POSTs at /book-services/<id> and /book/<id> from many
+threads against a throwaway SQLite database, then checks that no night of
+the hotel is booked past its room count, that no email holds two
+active tour bookings for the same day and that a form submitted many
+times at once (one idempotency key) makes one booking. Losing requests
+must be turned away with a redirect; any 5xx answer or double booking
+makes it exit non-zero.
+
+    python benchmarks/booking_race.py [--threads 32] [--rooms 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'booking_race.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+os.environ['RATE_LIMIT_ENABLED'] = '0'  # every request comes from one client here
+
+from app import (  # noqa: E402
+    app, db, Place, Hotel, Booking, ServiceBooking, ACTIVE_STATUSES, upgrade_database, _nights
+)
+
+
+def setup(rooms):
+    with app.app_context():
+        upgrade_database()
+        place = Place(name='Race Fort', state='Karnataka', short_intro='-',
+                      description='-', culture_description='-')
+        db.session.add(place)
+        db.session.flush()
+        hotel = Hotel(place_id=place.id, name='Race Inn', price_per_night=1000, total_rooms=rooms)
+        db.session.add(hotel)
+        db.session.commit()
+        return place.id, hotel.id
+
+
+def fire(threads, make_request):
+    barrier = threading.Barrier(threads)
+
+    def worker(i):
+        client = app.test_client()
+        barrier.wait()
+        return make_request(client, i)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(worker, range(threads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rooms', type=int, default=3)
+    args = parser.parse_args()
+
+    place_id, hotel_id = setup(args.rooms)
+    check_in = date.today() + timedelta(days=30)
+
+    def book_hotel(client, i):
+        # Staggered, overlapping stays so every night is contended
+        start = check_in + timedelta(days=i % 3)
+        response = client.post(f'/book-services/{place_id}', data={
+            'customer_name': f'Guest {i}',
+            'customer_email': f'guest{i}@example.com',
+            'customer_phone': '9999999999',
+            'hotel_id': hotel_id,
+            'check_in': start.isoformat(),
+            'check_out': (start + timedelta(days=2)).isoformat(),
+            'num_rooms': '1',
+        })
+        return response.status_code, 'service-booking-success' in response.headers.get('Location', '')
+
+    def book_tour(client, i):
+        response = client.post(f'/book/{place_id}', data={
+            'name': f'Guest {i}',
+            'email': 'same.guest@example.com',
+            'phone': '9999999999',
+            'travel_date': check_in.isoformat(),
+            'num_people': '2',
+        })
+        return response.status_code, 'booking-success' in response.headers.get('Location', '')
+
+    replay_key = uuid.uuid4().hex
+
+    def replay_tour(client, i):
+        # The same form submitted again and again: one booking, every
+        # response redirected to it
+        response = client.post(f'/book/{place_id}', data={
+            'name': 'Replay Guest',
+            'email': 'replay.guest@example.com',
+            'phone': '9999999999',
+            'travel_date': check_in.isoformat(),
+            'num_people': '1',
+            'idempotency_key': replay_key,
+        })
+        return response.status_code, response.headers.get('Location', '')
+
+    hotel = fire(args.threads, book_hotel)
+    tour = fire(args.threads, book_tour)
+    replay = fire(args.threads, replay_tour)
+    hotel_ok = sum(ok for _, ok in hotel)
+    tour_ok = sum(ok for _, ok in tour)
+
+    failures = []
+    for name, results in [('hotel', hotel), ('tour', tour), ('replay', replay)]:
+        errors = sum(status >= 500 for status, _ in results)
+        if errors:
+            failures.append(f"{name}: {errors} request(s) answered with a server error")
+    replay_targets = {location for _, location in replay}
+    if len(replay_targets) != 1 or 'booking-success' not in next(iter(replay_targets)):
+        failures.append(f"replay: redirected to {sorted(replay_targets)}, expected one booking page")
+    with app.app_context():
+        per_night = {}
+        stays = ServiceBooking.query.filter(
+            ServiceBooking.hotel_id == hotel_id,
+            ServiceBooking.status.in_(ACTIVE_STATUSES)
+        ).all()
+        for stay in stays:
+            for night in _nights(stay.check_in_date, stay.check_out_date):
+                per_night[night] = per_night.get(night, 0) + stay.num_rooms
+        for night, rooms in sorted(per_night.items()):
+            if rooms > args.rooms:
+                failures.append(f"{night}: {rooms} rooms booked, hotel has {args.rooms}")
+
+        tours = Booking.query.filter(Booking.status.in_(ACTIVE_STATUSES),
+                                     Booking.email == 'same.guest@example.com').count()
+        if tours > 1:
+            failures.append(f"{tours} active tour bookings for one email on one day")
+
+    print(f"hotel: {hotel_ok}/{args.threads} accepted, busiest night "
+          f"{max(per_night.values(), default=0)}/{args.rooms} rooms")
+    print(f"tour:  {tour_ok}/{args.threads} accepted")
+    print(f"replay: {len(replay_targets)} distinct redirect(s) for {args.threads} submits")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print('OK' if not failures else 'DOUBLE BOOKED')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
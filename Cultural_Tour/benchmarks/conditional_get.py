@@ -0,0 +1,60 @@
+"""Bytes on the wire and server time for the public catalog pages.
+
+Compares a plain GET, a compressed GET and a conditional GET that is
+answered with 304, using the Flask test client against the configured
+database (upgraded first, like `flask prepare`).
+
+    python benchmarks/conditional_get.py [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, Place, upgrade_database  # noqa: E402
+
+
+def measure(client, url, headers, repeat):
+    response = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    return response, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    with app.app_context():
+        upgrade_database()
+        first_place = Place.query.first()
+    urls = ['/']
+    if first_place:
+        urls.append(f'/place/{first_place.id}')
+
+    print(f"{'url':<16}{'mode':<14}{'status':>7}{'bytes':>10}{'ms/req':>10}")
+    for url in urls:
+        plain, plain_ms = measure(client, url, {'Accept-Encoding': 'identity'}, args.repeat)
+        packed, packed_ms = measure(client, url, {'Accept-Encoding': 'gzip, br'}, args.repeat)
+        validators = {
+            'Accept-Encoding': 'gzip, br',
+            'If-None-Match': plain.headers.get('ETag', ''),
+        }
+        revalidated, revalidated_ms = measure(client, url, validators, args.repeat)
+
+        for mode, response, ms in [
+            ('identity', plain, plain_ms),
+            (packed.headers.get('Content-Encoding', 'identity'), packed, packed_ms),
+            ('if-none-match', revalidated, revalidated_ms),
+        ]:
+            print(f"{url:<16}{mode:<14}{response.status_code:>7}{len(response.get_data()):>10}{ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
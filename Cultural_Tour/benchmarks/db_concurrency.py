@@ -0,0 +1,148 @@
+"""Booking throughput of several worker processes sharing one database.
+
+Mimics gunicorn sync workers: --workers processes each start their own copy
+of the app, wait on a common barrier, then alternate service-booking POSTs
+with admin bookings listings (an uncached read) as fast as they can. Every
+database mode gets a freshly seeded copy of the same synthetic data:
+
+    rollback   SQLite rollback journal, synchronous=FULL, no busy timeout
+               (the previous defaults, apart from the driver's own wait)
+    wal        SQLite with the shipped pragmas: WAL, synchronous=NORMAL,
+               busy_timeout and mmap
+    postgres   the empty PostgreSQL database at BENCH_POSTGRES_URL, with
+               the pool settings from the environment (skipped when unset)
+
+and reports completed bookings per second, p50/p99 latency per request
+kind and the number of 5xx answers ("database is locked" shows up there).
+
+    python benchmarks/db_concurrency.py [--workers 8] [--requests 100]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    'rollback': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+                 'SQLITE_BUSY_TIMEOUT_MS': '', 'SQLITE_MMAP_SIZE': ''},
+    'wal': {},
+}
+
+
+def _use(database_url, mode_env):
+    # Runs in a fresh spawned process, before app is imported
+    os.environ.update(mode_env)
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['RATE_LIMIT_ENABLED'] = '0'  # each worker is one client posting flat out
+
+
+def prepare(database_url, mode_env, sizes):
+    _use(database_url, mode_env)
+    import synthetic_data
+    synthetic_data.seed(**sizes)
+    from app import app, db, Hotel
+    with app.app_context():
+        hotels = db.session.execute(db.select(Hotel.id, Hotel.place_id).order_by(Hotel.id)).all()
+        db.engine.dispose()
+    return [tuple(row) for row in hotels]
+
+
+def worker(database_url, mode_env, hotels, number, requests, barrier):
+    _use(database_url, mode_env)
+    from app import app
+    app.logger.disabled = True  # a locked database is counted, not logged
+
+    visitor, admin = app.test_client(), app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+    admin.get('/admin/bookings')
+
+    timings = {'book': [], 'list': []}
+    booked = errors = 0
+    barrier.wait()
+    started = time.perf_counter()
+    for i in range(requests):
+        request_started = time.perf_counter()
+        if i % 2 == 0:
+            hotel_id, place_id = hotels[(number * requests + i) % len(hotels)]
+            check_in = date.today() + timedelta(days=1 + (number * 7 + i) % 300)
+            response = visitor.post(f'/book-services/{place_id}', data={
+                'customer_name': f'Worker {number}',
+                'customer_email': f'w{number}-{i}@example.com',
+                'customer_phone': '9999999999',
+                'hotel_id': hotel_id,
+                'check_in': check_in.isoformat(),
+                'check_out': (check_in + timedelta(days=2)).isoformat(),
+                'num_rooms': '1',
+                'idempotency_key': uuid.uuid4().hex,
+            })
+            timings['book'].append(time.perf_counter() - request_started)
+            booked += 'service-booking-success' in response.headers.get('Location', '')
+        else:
+            response = admin.get('/admin/bookings?status=Pending')
+            timings['list'].append(time.perf_counter() - request_started)
+        errors += response.status_code >= 500
+    return time.perf_counter() - started, timings, booked, errors
+
+
+def percentile_ms(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)] * 1000 if values else 0.0
+
+
+def run_mode(name, database_url, mode_env, args, context):
+    sizes = {'places': args.places, 'bookings': args.bookings, 'service_bookings': args.bookings // 2}
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        hotels = pool.submit(prepare, database_url, mode_env, sizes).result()
+
+    with context.Manager() as manager:
+        barrier = manager.Barrier(args.workers)
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            results = list(pool.map(worker, *zip(*[
+                (database_url, mode_env, hotels, number, args.requests, barrier)
+                for number in range(args.workers)])))
+
+    wall = max(elapsed for elapsed, _, _, _ in results)
+    book = [t for _, timings, _, _ in results for t in timings['book']]
+    listing = [t for _, timings, _, _ in results for t in timings['list']]
+    booked = sum(result[2] for result in results)
+    errors = sum(result[3] for result in results)
+    print(f"{name:9} {booked / wall:9.1f} {percentile_ms(book, 50):9.1f} {percentile_ms(book, 99):9.1f} "
+          f"{percentile_ms(listing, 50):9.1f} {percentile_ms(listing, 99):9.1f} {booked:7} {errors:6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8, help='processes, like gunicorn -w')
+    parser.add_argument('--requests', type=int, default=100, help='per worker, half of them bookings')
+    parser.add_argument('--places', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--mode', action='append', choices=list(MODES) + ['postgres'])
+    args = parser.parse_args()
+
+    modes = dict(MODES)
+    if os.environ.get('BENCH_POSTGRES_URL'):
+        modes['postgres'] = {}
+    context = multiprocessing.get_context('spawn')
+    print(f"{args.workers} workers x {args.requests} requests\n"
+          f"{'mode':9} {'booked/s':>9} {'book p50':>9} {'book p99':>9} "
+          f"{'list p50':>9} {'list p99':>9} {'booked':>7} {'5xx':>6}")
+    for name, mode_env in modes.items():
+        if args.mode and name not in args.mode:
+            continue
+        if name == 'postgres':
+            database_url = os.environ['BENCH_POSTGRES_URL']
+        else:
+            database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'{name}.db')}"
+        run_mode(name, database_url, mode_env, args, context)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""Latency, throughput and query counts of the main pages at scale.
+
+Seeds a throwaway SQLite database with synthetic_data.py (or fills the empty
+database at BENCH_DATABASE_URL instead), then drives every scenario below
+through the Flask test client, or with --server through a local threaded
+WSGI server over real HTTP. Each scenario reports p50/p99 latency,
+requests per second and SQL statements per request, taken from the app's
+request metrics. Runs are reproducible for a given --seed: the data and
+the sequence of URLs and form posts are the same every time.
+
+    python benchmarks/load_test.py [--requests 200] [--threads 1] [--server]
+        [--save run.json] [--compare baseline.json] [--tolerance 20]
+
+With --compare, scenarios whose p50 grew by more than --tolerance percent
+or that run more SQL statements per request than in the baseline are
+flagged, and the script exits with status 1.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f'sqlite:///{_db_file}'
+os.environ['RATE_LIMIT_ENABLED'] = '0'  # every request comes from one client here
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import (  # noqa: E402
+    app, db, Place, Hotel, Transport, ADMIN_USERNAME, ADMIN_PASSWORD, BOOKING_STATUSES, request_metrics
+)
+import synthetic_data  # noqa: E402
+
+STATES = synthetic_data.STATES
+
+
+def catalog_ids():
+    with app.app_context():
+        place_ids = db.session.scalars(db.select(Place.id).order_by(Place.id)).all()
+        hotels = {}
+        for hotel_id, place_id in db.session.execute(db.select(Hotel.id, Hotel.place_id).order_by(Hotel.id)):
+            hotels.setdefault(place_id, []).append(hotel_id)
+        transports = {}
+        for transport_id, place_id in db.session.execute(
+                db.select(Transport.id, Transport.place_id).order_by(Transport.id)):
+            transports.setdefault(place_id, []).append(transport_id)
+    return place_ids, hotels, transports
+
+
+def build_scenarios(place_ids, hotels, transports):
+    """{name: (needs admin login, make(rng, i) -> (method, path, form or None))}"""
+    hotel_places = sorted(hotels)
+
+    def book_services_post(rng, i):
+        place_id = rng.choice(hotel_places)
+        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+        form = {
+            'customer_name': f"Load {i}",
+            'customer_email': f"load{i}-{uuid.UUID(int=rng.getrandbits(128)).hex[:8]}@example.com",
+            'customer_phone': '9999999999',
+            'hotel_id': rng.choice(hotels[place_id]),
+            'check_in': check_in.isoformat(),
+            'check_out': (check_in + timedelta(days=rng.randint(1, 4))).isoformat(),
+            'num_people': str(rng.randint(1, 4)),
+            'num_rooms': '1',
+            'idempotency_key': uuid.UUID(int=rng.getrandbits(128)).hex,
+        }
+        if transports.get(place_id):
+            form['transport_id'] = rng.choice(transports[place_id])
+        return 'POST', f'/book-services/{place_id}', form
+
+    return {
+        'index': (False, lambda rng, i: ('GET', '/', None)),
+        'index_state': (False, lambda rng, i: (
+            'GET', f'/?{urllib.parse.urlencode({"state": rng.choice(STATES)})}', None)),
+        'place_detail': (False, lambda rng, i: ('GET', f'/place/{rng.choice(place_ids)}', None)),
+        'book_services_get': (False, lambda rng, i: ('GET', f'/book-services/{rng.choice(place_ids)}', None)),
+        'book_services_post': (False, book_services_post),
+        'admin_bookings': (True, lambda rng, i: ('GET', '/admin/bookings', None)),
+        'admin_bookings_filtered': (True, lambda rng, i: ('GET', '/admin/bookings?' + urllib.parse.urlencode({
+            'status': rng.choice(BOOKING_STATUSES), 'place_id': rng.choice(place_ids)}), None)),
+        'admin_service_bookings': (True, lambda rng, i: ('GET', '/admin/service-bookings', None)),
+    }
+
+
+class TestClientDriver:
+    """Requests through app.test_client(), one visitor and one admin client per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self, admin):
+        clients = self._local.__dict__.setdefault('clients', {})
+        if admin not in clients:
+            clients[admin] = app.test_client()
+            if admin:
+                with clients[admin].session_transaction() as session:
+                    session['admin_logged_in'] = True
+        return clients[admin]
+
+    def request(self, method, path, form, admin):
+        return self._client(admin).open(path, method=method, data=form).status_code
+
+    def close(self):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ServerDriver:
+    """Requests over HTTP to a threaded werkzeug server on a free local port."""
+
+    def __init__(self):
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no access log line per request
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._local = threading.local()
+
+    def _opener(self, admin):
+        # Visitors and admins get separate cookie jars, so public pages
+        # are still served from the page cache
+        openers = self._local.__dict__.setdefault('openers', {})
+        if admin not in openers:
+            openers[admin] = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+            if admin:
+                self._send(openers[admin], 'POST', '/admin/login',
+                           {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+        return openers[admin]
+
+    def _send(self, opener, method, path, form):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        try:
+            with opener.open(urllib.request.Request(self.base + path, data=data, method=method)) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+    def request(self, method, path, form, admin):
+        return self._send(self._opener(admin), method, path, form)
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+
+def _app_totals():
+    with app.app_context():
+        stats = request_metrics.stats().values()
+    return sum(entry['count'] for entry in stats), sum(entry['queries'] for entry in stats)
+
+
+def run_scenario(driver, name, admin, make, requests, warmup, threads, seed):
+    def one(i):
+        method, path, form = make(random.Random(f'{seed}-{name}-{i}'), i)
+        started = time.perf_counter()
+        status = driver.request(method, path, form, admin)
+        return time.perf_counter() - started, status
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(warmup)))
+        before = _app_totals()
+        started = time.perf_counter()
+        results = list(pool.map(one, range(warmup, warmup + requests)))
+        wall = time.perf_counter() - started
+    app_requests, app_queries = [after - earlier for after, earlier in zip(_app_totals(), before)]
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'rps': round(requests / wall, 1),
+        'queries_per_request': round(app_queries / max(app_requests, 1), 2),
+        'statuses': statuses,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline run; returns the regressed scenario names."""
+    regressed = []
+    print(f"\nAgainst {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta']['timestamp']}):")
+    for key in ('mode', 'threads', 'seed', 'data', 'database'):
+        if baseline['meta'].get(key) != results['meta'][key]:
+            print(f"  note: {key} differs from the baseline, timings are not comparable")
+    for name, now in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        more_queries = now['queries_per_request'] > before['queries_per_request']
+        flag = change > tolerance or more_queries
+        if flag:
+            regressed.append(name)
+        print(f"{name:26} p50 {before['p50_ms']:8.2f} -> {now['p50_ms']:8.2f} ms ({change:+6.1f}%)  "
+              f"queries {before['queries_per_request']:6.2f} -> {now['queries_per_request']:6.2f}"
+              f"{'  REGRESSED' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synthetic_data.add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per scenario first')
+    parser.add_argument('--threads', type=int, default=1, help='concurrent clients')
+    parser.add_argument('--server', action='store_true', help='go through a local HTTP server')
+    parser.add_argument('--scenario', action='append', help='run only these (repeatable)')
+    parser.add_argument('--save', help='write the results as JSON here')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=20.0, help='allowed p50 growth, percent')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = synthetic_data.seed_from_args(args)
+    print(f"Seeded {', '.join(f'{n} {table}' for table, n in counts.items())} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    # Query counts come from the request metrics; keep their slow-request log quiet
+    app.config.update(METRICS_ENABLED=True, SLOW_REQUEST_MS=float('inf'),
+                      REQUEST_QUERY_BUDGET=float('inf'))
+    scenarios = build_scenarios(*catalog_ids())
+    driver = ServerDriver() if args.server else TestClientDriver()
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'mode': 'server' if args.server else 'test-client',
+            'threads': args.threads,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'data': counts,
+            'database': urllib.parse.urlparse(os.environ['DATABASE_URL']).scheme,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'scenarios': {},
+    }
+    print(f"{'scenario':26} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}  statuses")
+    try:
+        for name, (admin, make) in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            result = run_scenario(driver, name, admin, make, args.requests, args.warmup, args.threads, args.seed)
+            results['scenarios'][name] = result
+            print(f"{name:26} {result['p50_ms']:8.2f} {result['p99_ms']:8.2f} {result['rps']:8.1f} "
+                  f"{result['queries_per_request']:8.2f}  {result['statuses']}")
+    finally:
+        driver.close()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            print(f"{len(regressed)} scenario(s) regressed: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Booking latency with the notification outbox, and the outbox's delivery rate.
+
+Runs a smtp_sink.SMTPSink that takes --delay seconds per message (a slow
+provider) and refuses --fail-rate of them with a temporary error, then:
+
+  1. posts --bookings service bookings through the test client; each one
+     only adds its outbox row, so the latency doesn't depend on --delay
+  2. times sending one of those emails inline, which is what every POST
+     would add if it talked to the mail server itself
+  3. drains the outbox with --threads delivery threads (retry backoff cut
+     to --retry-base seconds) and reports messages per second, attempts
+     and anything left failed
+
+    python benchmarks/notification_outbox.py [--bookings 200] [--threads 4] \\
+        [--delay 0.05] [--fail-rate 0.1]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'notification_outbox.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+os.environ['RATE_LIMIT_ENABLED'] = '0'  # every request comes from one client here
+
+from app import (  # noqa: E402
+    create_app, db, Hotel, Notification, send_emails, start_notification_workers, outbox_stats
+)
+import synthetic_data  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+
+def post_bookings(app, count):
+    with app.app_context():
+        hotels = db.session.execute(db.select(Hotel.id, Hotel.place_id).order_by(Hotel.id)).all()
+    rng = random.Random(1)
+    client = app.test_client()
+    timings = []
+    for i in range(count):
+        hotel_id, place_id = rng.choice(hotels)
+        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+        started = time.perf_counter()
+        response = client.post(f'/book-services/{place_id}', data={
+            'customer_name': f"Guest {i}",
+            'customer_email': f"guest{i}@example.com",
+            'customer_phone': '9999999999',
+            'hotel_id': hotel_id,
+            'check_in': check_in.isoformat(),
+            'check_out': (check_in + timedelta(days=2)).isoformat(),
+            'num_rooms': '1',
+            'idempotency_key': uuid.uuid4().hex,
+        })
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 302, response.status_code
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4, help='delivery threads')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.05, help='SMTP seconds per message')
+    parser.add_argument('--fail-rate', type=float, default=0.1, help='share of messages refused with 451')
+    parser.add_argument('--retry-base', type=float, default=0.2, help='seconds before the first retry')
+    args = parser.parse_args()
+
+    synthetic_data.seed(places=50, bookings=0, service_bookings=0)
+    sink = SMTPSink(delay=args.delay, fail_rate=args.fail_rate).start()
+    app = create_app({'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': sink.port, 'NOTIFY_BATCH_SIZE': args.batch_size,
+                      'NOTIFY_RETRY_BASE': args.retry_base, 'NOTIFY_MAX_ATTEMPTS': 8,
+                      'NOTIFY_POLL_INTERVAL': 0.05})
+    app.logger.disabled = True  # refusals are counted below, not logged
+
+    timings = post_bookings(app, args.bookings)
+    print(f"{args.bookings} booking POSTs: p50 {statistics.median(timings):.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms (SMTP delay {args.delay * 1000:.0f} ms/message)")
+
+    with app.app_context():
+        sample = Notification.query.first()
+        started = time.perf_counter()
+        send_emails([sample])
+        print(f"One email sent inline instead: {(time.perf_counter() - started) * 1000:.2f} ms per booking")
+        queued = Notification.query.count()
+    sink.accepted = sink.rejected = 0
+
+    stop = threading.Event()
+    started = time.perf_counter()
+    start_notification_workers(app, args.threads, stop)
+    while True:
+        with app.app_context():
+            stats = outbox_stats()
+        if not stats.get('pending'):
+            break
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - started
+    stop.set()
+
+    with app.app_context():
+        attempts = db.session.query(db.func.sum(Notification.attempts)).scalar()
+    print(f"Delivered {stats.get('sent', 0)} of {queued} with {args.threads} thread(s) in {elapsed:.2f}s "
+          f"({stats.get('sent', 0) / elapsed:.1f} messages/s); {attempts} attempts, "
+          f"{sink.rejected} refused by the sink, {stats.get('failed', 0)} failed for good")
+    sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Cost of a rate limit check, and what a throttled bot costs the app.
+
+  1. times RateLimiter.hit() over --keys distinct client keys with the
+     bucket LRU capped at --max-keys, and reports the buckets kept
+  2. floods /book-services/<place> with --flood POSTs from one IP (a new
+     email each time, as a bot would) while a second IP books normally,
+     and compares latency and SQL statements of accepted and throttled
+     requests
+
+    python benchmarks/rate_limit.py [--checks 1000000] [--keys 200000] [--flood 500]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'rate_limit.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import create_app, db, Hotel, RateLimiter, parse_rate  # noqa: E402
+import synthetic_data  # noqa: E402
+
+_statements = [0]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(*args):
+    _statements[0] += 1
+
+
+def check_cost(checks, keys, max_keys):
+    limiter = RateLimiter(max_keys)
+    rate, burst = parse_rate('60/minute')
+    names = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(keys)]
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.hit('booking_ip', names[i % keys], rate, burst)
+    elapsed = time.perf_counter() - started
+    stats = limiter.stats()
+    print(f"{checks} checks over {keys} keys: {elapsed / checks * 1e9:.0f} ns/check; "
+          f"{stats['keys']} buckets kept (max {max_keys}), {stats['evictions']} evicted")
+
+
+def book(client, hotel, email, ip, day):
+    hotel_id, place_id = hotel
+    check_in = date.today() + timedelta(days=30 + day % 200)
+    before = _statements[0]
+    started = time.perf_counter()
+    response = client.post(f'/book-services/{place_id}', environ_base={'REMOTE_ADDR': ip}, data={
+        'customer_name': 'Rate Bench',
+        'customer_email': email,
+        'customer_phone': '9999999999',
+        'hotel_id': hotel_id,
+        'check_in': check_in.isoformat(),
+        'check_out': (check_in + timedelta(days=2)).isoformat(),
+        'num_rooms': '1',
+        'idempotency_key': uuid.uuid4().hex,
+    })
+    return response.status_code, (time.perf_counter() - started) * 1000, _statements[0] - before
+
+
+def flood(count):
+    synthetic_data.seed(places=50, bookings=2000, service_bookings=1000)
+    app = create_app({'TEMPLATE_CACHE_DIR': '', 'RATE_LIMIT_ENABLED': True})
+    app.logger.disabled = True
+    with app.app_context():
+        hotels = [tuple(row) for row in db.session.execute(db.select(Hotel.id, Hotel.place_id).order_by(Hotel.id))]
+    client = app.test_client()
+
+    results = {302: [], 429: []}
+    human = []
+    for i in range(count):
+        status, ms, statements = book(client, hotels[i % len(hotels)], f'bot{i}@example.com', '203.0.113.9', i)
+        results.setdefault(status, []).append((ms, statements))
+        if i % 50 == 0:
+            human.append(book(client, hotels[-1 - i // 50 % len(hotels)], f'guest{i}@example.com', '198.51.100.7', i + 1))
+
+    print(f"\n{count} POSTs from one IP, limit {app.config['RATE_LIMITS']['booking_ip']}:")
+    for status, rows in sorted(results.items()):
+        if rows:
+            print(f"  {status}: {len(rows):4} requests, p50 {statistics.median(r[0] for r in rows):6.2f} ms, "
+                  f"{statistics.mean(r[1] for r in rows):5.1f} SQL statements each")
+    print(f"Meanwhile another IP: {sum(status == 302 for status, _, _ in human)} of {len(human)} booked")
+    with app.app_context():
+        print(f"Limiter: {app.extensions['rate_limiter'].stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checks', type=int, default=1000000)
+    parser.add_argument('--keys', type=int, default=200000, help='distinct client keys checked')
+    parser.add_argument('--max-keys', type=int, default=100000, help='bucket LRU size')
+    parser.add_argument('--flood', type=int, default=500, help='POSTs from the flooding IP')
+    args = parser.parse_args()
+
+    check_cost(args.checks, args.keys, args.max_keys)
+    flood(args.flood)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Full-text search latency on a large synthetic catalog.
+
+Fills a throwaway SQLite database with generated places and hotels through
+import_catalog (which also builds the FTS5 index), then times
+search_places() for a mix of whole-word, prefix and multi-word queries.
+
+    python benchmarks/search_latency.py [--places 20000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'search_latency.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+
+from app import (  # noqa: E402
+    app, db, catalog_cache, upgrade_database, import_catalog, search_enabled, search_places
+)
+
+STATES = ["Karnataka", "Tamil Nadu", "Andhra Pradesh", "Maharashtra"]
+WORDS = ("temple fort palace weaving silk bronze coastal dance festival carving "
+         "stepwell mural puppet pottery lacquer toy heritage royal market shrine "
+         "cave waterfall village harvest drum lamp textile spice monsoon garden").split()
+AMENITIES = ["WiFi", "Pool", "AC", "Restaurant", "Spa", "Parking", "Ayurveda"]
+QUERIES = ["temple", "silk weaving", "fort", "pupp", "coastal dance festival",
+           "ayurveda", "Karnataka", "zzz nothing"]
+
+
+SYLLABLES = "ka ra ma na ta pa la va sa ha ga da ba ya ja ri ni ti mu ku lu".split()
+
+
+def vocabulary(rng, size=5000):
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def text(rng, n, filler):
+    # Mostly filler words, with a theme word now and then, so a theme
+    # query matches a slice of the catalog rather than all of it
+    return ' '.join(rng.choice(WORDS) if rng.random() < 0.05 else rng.choice(filler)
+                    for _ in range(n))
+
+
+def setup(count):
+    rng = random.Random(42)
+    filler = vocabulary(rng)
+    places = [{
+        'name': f"{rng.choice(WORDS).title()} {rng.choice(filler).title()} {i}",
+        'state': rng.choice(STATES),
+        'city': f"Town {i % 500}",
+        'short_intro': text(rng, 12, filler),
+        'description': text(rng, 60, filler),
+        'culture_description': text(rng, 40, filler),
+        'price_per_person': rng.randint(500, 5000),
+        'duration_days': rng.randint(1, 5),
+    } for i in range(count)]
+    hotels = [{
+        'place': place['name'],
+        'name': f"Inn {i}",
+        'amenities': ', '.join(rng.sample(AMENITIES, 3)),
+    } for i, place in enumerate(places[::4])]
+    with app.app_context():
+        upgrade_database()
+        started = time.perf_counter()
+        counts, errors = import_catalog({'places': places, 'hotels': hotels}, batch_size=1000)
+        assert not errors, errors[:5]
+        db.session.commit()
+        catalog_cache.invalidate()
+        print(f"Loaded {counts['places']} places, {counts['hotels']} hotels "
+              f"in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--places', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup(args.places)
+    with app.app_context():
+        print(f"FTS5 index: {'yes' if search_enabled() else 'no, catalog fallback'}")
+        search_places('warm up')
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                results = search_places(query)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"{query!r:26} {len(results):3} hits  "
+                  f"p50 {statistics.median(timings):6.2f} ms  "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1]:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Stub SMTP server that accepts and drops every message.
+
+For running the notification workers locally and in benchmarks without a
+real mail server. --delay makes each message slow like a remote provider,
+--fail-rate answers that share of messages with a temporary 451 error so
+the retry path gets exercised.
+
+    python benchmarks/smtp_sink.py [--port 1025] [--delay 0.2] [--fail-rate 0.1]
+    SMTP_HOST=127.0.0.1 SMTP_PORT=1025 flask --app app notify-worker
+"""
+import argparse
+import email
+import random
+import socketserver
+import threading
+import time
+
+
+class _Session(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        recipients = []
+        self.reply('220 smtp-sink ready')
+        for line in self.rfile:
+            command = line.decode('ascii', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 smtp-sink')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for line in self.rfile:
+                    if line.rstrip(b'\r\n') == b'.':
+                        break
+                    data.append(line)
+                self.reply(sink.receive(recipients, b''.join(data)))
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink:
+    """Threaded SMTP sink on host:port (port 0 picks a free one)."""
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, fail_rate=0.0, seed=1, verbose=False):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.accepted = 0
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), _Session)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.port = self.server.server_address[1]
+
+    def receive(self, recipients, data):
+        time.sleep(self.delay)
+        with self._lock:
+            failed = self._rng.random() < self.fail_rate
+            if failed:
+                self.rejected += 1
+            else:
+                self.accepted += 1
+        if self.verbose:
+            subject = email.message_from_bytes(data).get('Subject', '')
+            print(f"{'REJECTED' if failed else 'accepted'} to {', '.join(recipients)}: {subject}", flush=True)
+        return '451 Temporary failure, try again later' if failed else '250 OK queued'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds per message')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of messages refused with 451')
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.delay, args.fail_rate, verbose=True)
+    print(f"SMTP sink on {args.host}:{sink.port}, Ctrl+C to stop")
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        sink.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
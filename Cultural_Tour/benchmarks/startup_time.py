@@ -0,0 +1,129 @@
+"""Worker boot and test-app setup time.
+
+Every worker is a fresh interpreter, timed from its first line until it
+has answered its first requests (/, a place page and its booking page):
+
+    cold        import app, create_app(), compile templates on first use
+    cached      the same, with the template cache `flask prepare` filled
+    preload     forked from a master that ran create_app(warm=True), as
+                with gunicorn --preload 'app:create_app(warm=True)'
+
+It also times an isolated test app: create_app() on an in-memory SQLite
+database plus upgrade_database().
+
+    python benchmarks/startup_time.py [--runs 5] [--places 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PHASES = ['import', 'create_app', 'first_requests']
+
+
+def first_requests(app, place_id):
+    client = app.test_client()
+    for path in ['/', f'/place/{place_id}', f'/book-services/{place_id}']:
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+
+
+def worker(mode, place_id, runs):
+    """Runs in the child interpreter; prints one JSON timing dict per worker."""
+    started = time.perf_counter()
+    import app as module
+    imported = time.perf_counter()
+    app = module.create_app(warm=mode == 'preload')
+    created = time.perf_counter()
+    if mode != 'preload':
+        first_requests(app, place_id)
+        print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                          'first_requests': time.perf_counter() - created}))
+        return
+
+    # The master's own setup is paid once however many workers it forks
+    for _ in range(runs):
+        read, write = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            first_requests(app, place_id)
+            os.write(write, json.dumps({'import': 0.0, 'create_app': 0.0,
+                                        'first_requests': time.perf_counter() - forked}).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as pipe:
+            print(pipe.read())
+        os.waitpid(pid, 0)
+    print(json.dumps({'master': created - started}))
+
+
+def spawn(mode, place_id, runs, env):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', mode, '--place-id',
+                             str(place_id), '--runs', str(runs)],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+
+def test_app_setup(runs):
+    from app import create_app, upgrade_database
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TEMPLATE_CACHE_DIR': '', 'TESTING': True})
+        with app.app_context():
+            upgrade_database()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='workers (and test apps) per mode')
+    parser.add_argument('--places', type=int, default=200)
+    parser.add_argument('--worker', choices=['cold', 'cached', 'preload'], help=argparse.SUPPRESS)
+    parser.add_argument('--place-id', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args.worker, args.place_id, args.runs)
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+               TEMPLATE_CACHE_DIR=os.path.join(workdir, 'template-cache'))
+    # Seeding and `flask prepare` run in their own interpreters, so every
+    # worker below starts with nothing imported and nothing cached
+    subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'synthetic_data.py'),
+                    '--database', env['DATABASE_URL'], '--places', str(args.places),
+                    '--bookings', '1000', '--service-bookings', '500'], env=env, cwd=ROOT, check=True)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'prepare'], env=env, cwd=ROOT,
+                   check=True, stdout=subprocess.DEVNULL)
+    place_id = 1
+
+    print(f"\n{'mode':8} {'import':>9} {'create':>9} {'first req':>9} {'boot':>9}   (median ms of {args.runs})")
+    for mode in ['cold', 'cached', 'preload']:
+        if mode == 'preload':
+            results = spawn(mode, place_id, args.runs, env)
+            master = results.pop()['master']
+        else:
+            mode_env = dict(env, TEMPLATE_CACHE_DIR='') if mode == 'cold' else env
+            results = [spawn(mode, place_id, 1, mode_env)[0] for _ in range(args.runs)]
+        medians = {phase: statistics.median(result[phase] for result in results) * 1000 for phase in PHASES}
+        print(f"{mode:8} {medians['import']:9.1f} {medians['create_app']:9.1f} "
+              f"{medians['first_requests']:9.1f} {sum(medians.values()):9.1f}"
+              + (f"   master once: {master * 1000:.0f} ms" if mode == 'preload' else ''))
+
+    timings = test_app_setup(args.runs)
+    print(f"\nIsolated test app (create_app on sqlite:// + upgrade_database): "
+          f"median {statistics.median(timings) * 1000:.1f} ms, first {timings[0] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Seeded synthetic catalog and bookings for benchmarks.
+
+The same seed and sizes always produce the same rows, so timings taken on
+two commits are comparable. Places, hotels and transports go through
+import_catalog (which also fills the search index); bookings and service
+bookings are batched INSERTs spread over the last --days days, followed by
+rebuild_occupancy() and rebuild_stats() as after a restore.
+
+    python benchmarks/synthetic_data.py --database sqlite:///synthetic.db \\
+        [--seed 1] [--places 500] [--hotels 3] [--transports 2] \\
+        [--bookings 20000] [--service-bookings 10000]
+
+app is imported inside seed(), so callers set DATABASE_URL first.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STATES = ["Karnataka", "Tamil Nadu", "Andhra Pradesh", "Maharashtra"]
+WORDS = ("temple fort palace weaving silk bronze coastal dance festival carving "
+         "stepwell mural puppet pottery lacquer toy heritage royal market shrine "
+         "cave waterfall village harvest drum lamp textile spice monsoon garden").split()
+AMENITIES = ["WiFi", "Pool", "AC", "Restaurant", "Spa", "Parking", "Ayurveda"]
+TOUR_STATUSES = (['Pending'] * 3 + ['Confirmed'] * 6 + ['Rejected'])
+SERVICE_STATUSES = (['Pending'] * 3 + ['Confirmed'] * 6 + ['Cancelled'])
+BATCH_SIZE = 1000
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def catalog_rows(rng, places, hotels, transports):
+    """{kind: [rows]} for import_catalog; hotels/transports are per-place averages."""
+    place_rows, hotel_rows, transport_rows = [], [], []
+    for i in range(places):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}"
+        place_rows.append({
+            'name': name,
+            'state': rng.choice(STATES),
+            'city': f"Town {i % 200}",
+            'short_intro': sentence(rng, 10),
+            'description': ' '.join(sentence(rng, 12) for _ in range(6)),
+            'culture_description': ' '.join(sentence(rng, 12) for _ in range(4)),
+            'price_per_person': rng.randrange(500, 15000, 50),
+            'duration_days': rng.randint(1, 7),
+        })
+        for j in range(rng.randint(0, 2 * hotels)):
+            hotel_rows.append({
+                'place': name,
+                'name': f"{rng.choice(WORDS).title()} Inn {i}-{j}",
+                'description': sentence(rng, 15),
+                'price_per_night': rng.randrange(800, 9000, 100),
+                'rating': rng.choice([3.0, 3.5, 4.0, 4.5, 5.0]),
+                'total_rooms': rng.randint(5, 60),
+                'amenities': ', '.join(rng.sample(AMENITIES, 3)),
+            })
+        for j in range(rng.randint(0, 2 * transports)):
+            transport_rows.append({
+                'place': name,
+                'transport_type': rng.choice(['bus', 'cab', 'train']),
+                'name': f"{rng.choice(WORDS).title()} Line {i}-{j}",
+                'price': rng.randrange(100, 3000, 50),
+                'capacity': rng.randint(4, 60),
+                'duration_hours': rng.choice([1.5, 4, 8, 12]),
+            })
+    return {'places': place_rows, 'hotels': hotel_rows, 'transports': transport_rows}
+
+
+def _created(rng, days):
+    return datetime.utcnow() - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def booking_rows(rng, place_ids, count, days):
+    today = date.today()
+    return [{
+        'place_id': rng.choice(place_ids),
+        'name': f"Guest {i}",
+        # One email per booking, so the unique active-booking index never trips
+        'email': f"guest{i}@example.com",
+        'phone': f"9{i:09d}",
+        'travel_date': today + timedelta(days=rng.randint(-days, 120)),
+        'num_people': rng.randint(1, 8),
+        'status': rng.choice(TOUR_STATUSES),
+        'created_at': _created(rng, days),
+    } for i in range(count)]
+
+
+def service_booking_rows(rng, services, count, days):
+    """services: [(place_id, [(hotel_id, price, rooms)], [(transport_id, price)])]"""
+    today = date.today()
+    rows = []
+    for i in range(count):
+        place_id, hotels, transports = rng.choice(services)
+        hotel = rng.choice(hotels) if hotels and rng.random() < 0.8 else None
+        transport = rng.choice(transports) if transports and (hotel is None or rng.random() < 0.5) else None
+        check_in = today + timedelta(days=rng.randint(-days, 120))
+        num_days, num_rooms, num_people = rng.randint(1, 5), rng.randint(1, 2), rng.randint(1, 6)
+        hotel_total = hotel[1] * num_days * num_rooms if hotel else 0.0
+        transport_total = transport[1] * num_people if transport else 0.0
+        rows.append({
+            'place_id': place_id,
+            'customer_name': f"Traveller {i}",
+            'customer_email': f"traveller{i}@example.com",
+            'customer_phone': f"8{i:09d}",
+            'hotel_id': hotel[0] if hotel else None,
+            'transport_id': transport[0] if transport else None,
+            'check_in_date': check_in,
+            'check_out_date': check_in + timedelta(days=num_days),
+            'num_people': num_people,
+            'num_rooms': num_rooms,
+            'num_days': num_days,
+            'hotel_total': hotel_total,
+            'transport_total': transport_total,
+            'total_amount': hotel_total + transport_total,
+            'status': rng.choice(SERVICE_STATUSES),
+            'created_at': _created(rng, days),
+        })
+    return rows
+
+
+def seed(seed=1, places=500, hotels=3, transports=2, bookings=20000, service_bookings=10000, days=90):
+    """Fill the configured database; returns {table: rows inserted}."""
+    from app import (app, db, Place, Hotel, Transport, Booking, ServiceBooking, catalog_changed,
+                     upgrade_database, import_catalog, rebuild_occupancy, rebuild_stats)
+
+    rng = random.Random(seed)
+    with app.app_context():
+        upgrade_database()
+        counts, errors = import_catalog(catalog_rows(rng, places, hotels, transports), BATCH_SIZE)
+        if errors:
+            raise ValueError(f"synthetic catalog rejected: {errors[:5]}")
+        db.session.commit()
+
+        place_ids = db.session.scalars(db.select(Place.id).order_by(Place.id)).all()
+        hotels_by_place, transports_by_place = {}, {}
+        for hotel_id, place_id, price, rooms in db.session.execute(
+                db.select(Hotel.id, Hotel.place_id, Hotel.price_per_night, Hotel.total_rooms).order_by(Hotel.id)):
+            hotels_by_place.setdefault(place_id, []).append((hotel_id, price, rooms))
+        for transport_id, place_id, price in db.session.execute(
+                db.select(Transport.id, Transport.place_id, Transport.price).order_by(Transport.id)):
+            transports_by_place.setdefault(place_id, []).append((transport_id, price))
+        services = [(place_id, hotels_by_place.get(place_id, []), transports_by_place.get(place_id, []))
+                    for place_id in place_ids
+                    if place_id in hotels_by_place or place_id in transports_by_place]
+
+        for model, rows in [(Booking, booking_rows(rng, place_ids, bookings, days)),
+                            (ServiceBooking, service_booking_rows(rng, services, service_bookings, days)
+                             if services else [])]:
+            for start in range(0, len(rows), BATCH_SIZE):
+                db.session.execute(db.insert(model), rows[start:start + BATCH_SIZE])
+            counts[model.__tablename__] = len(rows)
+        db.session.commit()
+
+        counts['hotel_night'] = rebuild_occupancy()
+        counts['dashboard_stat'] = rebuild_stats()
+        catalog_changed()
+    return counts
+
+
+def add_arguments(parser):
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--places', type=int, default=500)
+    parser.add_argument('--hotels', type=int, default=3, help='average hotels per place')
+    parser.add_argument('--transports', type=int, default=2, help='average transports per place')
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--service-bookings', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=90, help='spread of booking created_at')
+
+
+def seed_from_args(args):
+    return seed(args.seed, args.places, args.hotels, args.transports,
+                args.bookings, args.service_bookings, args.days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True,
+                        help='SQLAlchemy URL to fill, e.g. sqlite:///synthetic.db')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database
+    started = time.perf_counter()
+    counts = seed_from_args(args)
+    print(f"Seeded {', '.join(f'{n} {table}' for table, n in counts.items())} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
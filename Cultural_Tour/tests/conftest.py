@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, upgrade_database  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """A throwaway app on an in-memory database with the full schema."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'TEMPLATE_CACHE_DIR': '',
+        'RATE_LIMIT_ENABLED': False,
+        'CATALOG_VERSION_CHECK_INTERVAL': 0,
+    })
+    with app.app_context():
+        upgrade_database()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
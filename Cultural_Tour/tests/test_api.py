@@ -0,0 +1,34 @@
+from sqlalchemy import event
+
+from app import db, Place, Hotel
+
+
+def test_api_revalidation_does_not_load_the_catalog(app):
+    with app.app_context():
+        place = Place(name='Hampi', state='Karnataka', city='Hampi',
+                      short_intro='Intro', description='Description', culture_description='Culture')
+        db.session.add(place)
+        db.session.flush()
+        db.session.add(Hotel(place_id=place.id, name='Heritage Stay', price_per_night=1500))
+        db.session.commit()
+        engine = db.engine
+    client = app.test_client()
+    etag = client.get('/api/v1/hotels').headers['ETag']
+
+    with app.app_context():
+        app.extensions['catalog_cache'].invalidate()
+        app.extensions['page_cache'].invalidate()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/api/v1/hotels', headers={'If-None-Match': etag})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 304
+    # The stored catalog version and one max(created_at) lookup per table
+    assert len(statements) <= 2, statements
+    assert not any('JOIN' in statement or ' IN (' in statement for statement in statements)
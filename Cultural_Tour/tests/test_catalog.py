@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db, Place, Hotel, Transport
+
+
+def add_places(count, start=0):
+    for number in range(start, start + count):
+        place = Place(name=f'Place {number}', state='Karnataka', city='Mysuru',
+                      short_intro='Intro', description='Description', culture_description='Culture')
+        db.session.add(place)
+        db.session.flush()
+        db.session.add_all([
+            Hotel(place_id=place.id, name=f'Hotel {number}a', price_per_night=1000, amenities='wifi,pool'),
+            Hotel(place_id=place.id, name=f'Hotel {number}b', price_per_night=2000, amenities='wifi'),
+            Transport(place_id=place.id, transport_type='bus', name=f'Bus {number}', price=300),
+            Transport(place_id=place.id, transport_type='cab', name=f'Cab {number}', price=900),
+        ])
+    db.session.commit()
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def index_queries(app):
+    # A fresh client and emptied caches, so every request loads the catalog
+    with app.app_context():
+        engine = db.engine
+        app.extensions['catalog_cache'].invalidate()
+        app.extensions['page_cache'].invalidate()
+    with count_queries(engine) as statements:
+        response = app.test_client().get('/')
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_index_query_count_does_not_grow_with_the_catalog(app):
+    with app.app_context():
+        add_places(10)
+    small = index_queries(app)
+    with app.app_context():
+        add_places(10, start=10)
+    large = index_queries(app)
+    assert large == small
+
+
+def test_index_lists_every_place_with_its_hotels(app):
+    with app.app_context():
+        add_places(3)
+    body = app.test_client().get('/').get_data(as_text=True)
+    for number in range(3):
+        assert f'Place {number}' in body
+
+
+def test_index_cache_ignores_unread_query_parameters(app):
+    with app.app_context():
+        add_places(3)
+    client = app.test_client()
+    for url in ['/', '/?x=1', '/?x=2', '/?utm_source=mail', '/?price=junk']:
+        assert client.get(url).status_code == 200
+    for url in ['/?price=0-2000&duration=1-2', '/?duration=1-2&price=0-2000&x=3', '/?price=0-2000&price=0-2000&duration=1-2']:
+        assert client.get(url).status_code == 200
+    with app.app_context():
+        assert app.extensions['page_cache'].stats()['size'] == 2
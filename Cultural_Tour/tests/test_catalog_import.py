@@ -0,0 +1,51 @@
+import csv
+
+from app import db, Place, Hotel, Transport
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def import_files(app, paths):
+    args = ['import-catalog']
+    for kind, path in paths.items():
+        args += [f'--{kind}', path]
+    return app.test_cli_runner().invoke(args=args)
+
+
+def test_reimporting_an_export_updates_instead_of_duplicating(app, tmp_path):
+    place = {'name': 'Hampi', 'state': 'Karnataka', 'city': 'Hampi', 'short_intro': 'Ruins',
+             'description': 'Vijayanagara capital', 'culture_description': 'Temples'}
+    paths = {
+        'places': write_csv(tmp_path / 'places.csv', [place, dict(place, state='Tamil Nadu')]),
+        'hotels': write_csv(tmp_path / 'hotels.csv', [
+            {'place': 'Hampi', 'place_state': 'Karnataka', 'name': 'Heritage Stay', 'price_per_night': '1500'}]),
+        'transports': write_csv(tmp_path / 'transports.csv', [
+            {'place': 'Hampi', 'place_state': 'Karnataka', 'transport_type': 'bus', 'name': 'KSRTC', 'price': '200'}]),
+    }
+    result = import_files(app, paths)
+    assert result.exit_code == 0, result.output
+
+    exported = {}
+    for kind in paths:
+        path = tmp_path / f'export_{kind}.csv'
+        result = app.test_cli_runner().invoke(args=['export-catalog', f'--{kind}', str(path)])
+        assert result.exit_code == 0, result.output
+        exported[kind] = str(path)
+    with open(exported['hotels'], newline='', encoding='utf-8') as f:
+        hotels = list(csv.DictReader(f))
+    hotels[0]['price_per_night'] = '1800'
+    write_csv(exported['hotels'], hotels)
+
+    result = import_files(app, exported)
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert Place.query.count() == 2
+        assert Transport.query.count() == 1
+        assert [(h.name, h.price_per_night) for h in Hotel.query.all()] == [('Heritage Stay', 1800.0)]
+        assert db.session.get(Place, 1).name == 'Hampi'
@@ -0,0 +1,13 @@
+from app import db, explain_booking_checks, QUERY_PLANS
+
+
+def test_booking_checks_use_indexes(app):
+    with app.app_context():
+        _, _, full_scan = QUERY_PLANS[db.engine.dialect.name]
+        plans = dict(explain_booking_checks())
+    assert {'duplicate_tour_booking', 'hotel_full', 'duplicate_hotel_booking',
+            'duplicate_transport_booking', 'duplicate_place_service_booking'} <= set(plans)
+    for name, plan in plans.items():
+        assert plan, name
+        assert not [step for step in plan if full_scan(step)], (name, plan)
+        assert not [step for step in plan if step.startswith(('SCAN booking', 'SCAN service_booking'))], (name, plan)